@@ -1,10 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 import os
 from dotenv import load_dotenv
 
+from logger import logger
+
 load_dotenv()
 
 # Database URL - defaults to SQLite for easy start, can use PostgreSQL
@@ -14,9 +16,9 @@ DATABASE_URL = os.getenv(
 )
 
 # Database connection pool settings (PostgreSQL only)
-DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
-DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
-DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # seconds
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
 
 # Create engine with proper connection pooling
 if "sqlite" in DATABASE_URL:
@@ -26,8 +28,14 @@ if "sqlite" in DATABASE_URL:
         connect_args={"check_same_thread": False},
         poolclass=NullPool  # Disable pooling for SQLite
     )
-    print(f" Database: SQLite (in-memory pooling disabled)")
+    logger.info(" Database: SQLite (in-memory pooling disabled)")
 else:
+    # Batch multi-row INSERTs (insertmanyvalues, all dialects); executemany_mode /
+    # executemany_batch_page_size (execute_batch for UPDATE/DELETE) only exist on psycopg2
+    batch_options = {"insertmanyvalues_page_size": 1000}
+    if make_url(DATABASE_URL).get_driver_name() == "psycopg2":
+        batch_options.update(executemany_mode="values_plus_batch", executemany_batch_page_size=500)
+
     # For PostgreSQL with connection pooling and reconnection
     engine = create_engine(
         DATABASE_URL,
@@ -35,12 +43,14 @@ else:
         max_overflow=DB_MAX_OVERFLOW,
         pool_pre_ping=True,  # Verify connections before using them
         pool_recycle=DB_POOL_RECYCLE,
-        echo=False  # Set to True for SQL debugging
+        echo=False,  # Set to True for SQL debugging
+        **batch_options
     )
-    print(f" Database: PostgreSQL (pool_size={DB_POOL_SIZE}, max_overflow={DB_MAX_OVERFLOW})")
+    logger.info(" Database: PostgreSQL (pool_size=%d, max_overflow=%d)", DB_POOL_SIZE, DB_MAX_OVERFLOW)
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: handlers read back what they just wrote, so skip the post-commit re-SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
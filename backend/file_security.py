@@ -8,12 +8,14 @@ import re
 import hashlib
 from typing import Tuple, Optional
 
+from logger import logger
+
 try:
     import magic
     MAGIC_AVAILABLE = True
 except ImportError:
     MAGIC_AVAILABLE = False
-    print("⚠️  python-magic not installed. File content validation will be limited.")
+    logger.warning("⚠️  python-magic not installed. File content validation will be limited.")
 
 
 class FileValidator:
@@ -87,7 +89,7 @@ class FileValidator:
                 if not self._mime_types_match(actual_mime_type, declared_mime_type):
                     return False, f"File content type '{actual_mime_type}' does not match declared type '{declared_mime_type}'. Possible malicious file."
             except Exception as e:
-                print(f"⚠️  Could not verify file content: {e}")
+                logger.warning("⚠️  Could not verify file content: %s", e)
                 # If magic check fails, we can still allow the file if other checks passed
                 # But log this for monitoring
 
@@ -132,7 +134,7 @@ class FileValidator:
         # Allow embedded files but log a warning
         for pattern in suspicious_patterns[:3]:  # Check first 3 (JS and Launch)
             if pattern in content:
-                print(f"⚠️  PDF contains potentially unsafe content: {pattern.decode('latin-1')}")
+                logger.warning("⚠️  PDF contains potentially unsafe content: %s", pattern.decode('latin-1'))
                 # For now, we block these. In production, you might want to:
                 # - Use a PDF sanitizer
                 # - Scan with antivirus
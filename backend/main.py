@@ -1,11 +1,15 @@
 import os
-import random
-import string
-from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional
+import functools
+import hashlib
+import secrets
+import time
+import traceback
+from datetime import date as date_type, datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Query, Request, Depends, File, UploadFile, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from google import genai
 from google.genai import types
@@ -16,12 +20,13 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import redis
-from sqlalchemy.orm import Session
-from database import engine, get_db, Base
+import redis.asyncio as aioredis
+from sqlalchemy import func, text, tuple_, update
+from sqlalchemy.orm import Session, joinedload
+from database import engine, get_db, Base, SessionLocal
 from models import Thread, Message, RateLimit
-import requests
-from urllib.parse import urlparse
-import json
+import httpx
+import orjson
 import asyncio
 import base64
 import io
@@ -50,7 +55,7 @@ def validate_environment():
     optional_vars = {
         'GOOGLE_SEARCH_ENGINE_ID': 'Google Custom Search Engine ID (will fall back to Gemini grounding)',
         'DATABASE_URL': 'Database URL (will fall back to SQLite)',
-        'REDIS_HOST': 'Redis host (will fall back to in-memory storage)',
+        'REDIS_HOST': 'Redis host (rate limiting will fall back to the database)',
     }
 
     missing_required = []
@@ -115,6 +120,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses (thread lists/details carry large HTML message bodies).
+# Starlette >= 0.46 (pinned in requirements.txt) skips text/event-stream, so SSE
+# endpoints still flush per frame; compress those at the reverse proxy instead.
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=1)
+
 # Add caching headers middleware
 @app.middleware("http")
 async def add_cache_headers(request: Request, call_next):
@@ -153,6 +163,14 @@ GEMINI_TOP_P = float(os.getenv("GEMINI_TOP_P", "1.0"))
 GEMINI_TOP_K = int(os.getenv("GEMINI_TOP_K", "1"))
 GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
 
+# Generation config shared by all streaming endpoints (immutable, built once)
+GEMINI_CONFIG = types.GenerateContentConfig(
+    temperature=GEMINI_TEMPERATURE,
+    top_p=GEMINI_TOP_P,
+    top_k=GEMINI_TOP_K,
+    max_output_tokens=GEMINI_MAX_OUTPUT_TOKENS,
+)
+
 # Authentication & Authorization Configuration
 BROWSER_API_KEY = os.getenv("BROWSER_API_KEY")  # Secret key from your browser
 ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")  # Secret key for admin access
@@ -166,6 +184,10 @@ if not ADMIN_API_KEY:
 # AI Model Configuration for Related Questions
 GEMINI_RELATED_QUESTIONS_TEMPERATURE = float(os.getenv("GEMINI_RELATED_QUESTIONS_TEMPERATURE", "0.7"))
 GEMINI_RELATED_QUESTIONS_MAX_TOKENS = int(os.getenv("GEMINI_RELATED_QUESTIONS_MAX_TOKENS", "256"))
+RELATED_QUESTIONS_CONFIG = types.GenerateContentConfig(
+    temperature=GEMINI_RELATED_QUESTIONS_TEMPERATURE,
+    max_output_tokens=GEMINI_RELATED_QUESTIONS_MAX_TOKENS,
+)
 
 # Rate Limiting Configuration
 RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "10/minute")
@@ -179,6 +201,13 @@ MAX_UPLOAD_SIZE_BYTES = MAX_UPLOAD_SIZE_MB * 1024 * 1024
 # Timeout Configuration
 API_REQUEST_TIMEOUT = int(os.getenv("API_REQUEST_TIMEOUT", "10"))
 
+# Shared HTTP/2 client so Custom Search calls reuse one keep-alive connection
+_cse_client = httpx.AsyncClient(
+    http2=True,
+    timeout=API_REQUEST_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=20),
+)
+
 # Server Configuration
 SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
@@ -190,13 +219,64 @@ logger.info(f" Free Tier Limit: {FREE_TIER_DAILY_LIMIT} searches/day")
 logger.info(f" Server will run on {SERVER_HOST}:{SERVER_PORT}")
 
 # Note: Session storage has been simplified to use database only
-# Redis is no longer needed for conversation history
+# Redis is only used for free tier rate-limit counters (optional)
+
+# Redis Configuration (rate limiting)
+REDIS_HOST = os.getenv("REDIS_HOST")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+
+# How often (seconds) Redis rate-limit counts are mirrored into the SQL table for admin stats
+RATE_LIMIT_FLUSH_INTERVAL = int(os.getenv("RATE_LIMIT_FLUSH_INTERVAL", "30"))
+# Upper bound on unflushed (ip, day) counts kept in memory while the database is unavailable
+RATE_LIMIT_PENDING_MAX_KEYS = int(os.getenv("RATE_LIMIT_PENDING_MAX_KEYS", "10000"))
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+redis_pool = None
+redis_client = None
+if REDIS_HOST:
+    # Shared async pool: concurrent requests don't serialize on one socket or block the event loop
+    redis_pool = aioredis.ConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        password=REDIS_PASSWORD,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        decode_responses=True
+    )
+    redis_client = aioredis.Redis(connection_pool=redis_pool)
+    logger.info(f" Rate limiting: Redis ({REDIS_HOST}:{REDIS_PORT}/{REDIS_DB})")
+else:
+    logger.info(" Rate limiting: database (REDIS_HOST not set)")
 
 
 # ============================================================
 # AUTHENTICATION & RATE LIMITING HELPERS
 # ============================================================
 
+@functools.lru_cache(maxsize=10_000)
+def _resolve_identifier(
+    browser_auth: Optional[str],
+    user_id: Optional[str],
+    client_host: str
+) -> tuple[str, bool]:
+    """
+    Pure (cacheable) tier resolution. BROWSER_API_KEY is read once at startup,
+    so results stay valid for the lifetime of the process.
+    """
+    # Check if request is from your browser with valid auth
+    if browser_auth and browser_auth == BROWSER_API_KEY and user_id:
+        # Pro tier: Browser user
+        return (user_id, True)
+    # Free tier: Use IP address as identifier
+    return (client_host, False)
+
+
 def get_user_identifier(
     request: Request,
     browser_auth: str = None,
@@ -208,17 +288,19 @@ def get_user_identifier(
     Returns:
         tuple: (user_identifier, is_browser_user)
     """
-    # Check if request is from your browser with valid auth
-    if browser_auth and browser_auth == BROWSER_API_KEY and user_id:
-        # Pro tier: Browser user
-        return (user_id, True)
-    else:
-        # Free tier: Use IP address as identifier
-        ip = request.client.host
-        return (ip, False)
+    return _resolve_identifier(browser_auth, user_id, request.client.host)
 
 
-def check_rate_limit(ip_address: str, db: Session) -> bool:
+def _rate_limit_key(ip_address: str, day) -> str:
+    """Redis key holding the search count for an IP on a given UTC day"""
+    return f"rl:{ip_address}:{day.isoformat()}"
+
+
+# Searches counted in Redis but not yet mirrored to the rate_limits table: {(ip, date): count}
+_pending_search_counts: Dict[tuple, int] = {}
+
+
+async def check_rate_limit(ip_address: str, db: Session) -> bool:
     """
     Check if free tier user exceeded daily limit
 
@@ -227,7 +309,17 @@ def check_rate_limit(ip_address: str, db: Session) -> bool:
     """
     today = datetime.now(timezone.utc).date()
 
-    # Find or create rate limit record for today
+    if redis_client is not None:
+        try:
+            count = int(await redis_client.get(_rate_limit_key(ip_address, today)) or 0)
+            if count >= FREE_TIER_DAILY_LIMIT:
+                logger.warning(f"⚠️  Rate limit exceeded for IP: {ip_address} ({count}/{FREE_TIER_DAILY_LIMIT})")
+                return True
+            return False
+        except redis.RedisError as e:
+            logger.error(f" Redis rate limit check failed, falling back to database: {e}")
+
+    # Find rate limit record for today
     rate_limit = db.query(RateLimit).filter(
         RateLimit.ip_address == ip_address,
         RateLimit.date == today
@@ -242,11 +334,28 @@ def check_rate_limit(ip_address: str, db: Session) -> bool:
     return False
 
 
-def track_search(ip_address: str, db: Session):
+async def track_search(ip_address: str, db: Session):
     """Increment search count for free tier user"""
-    try:
-        today = datetime.now(timezone.utc).date()
+    today = datetime.now(timezone.utc).date()
+
+    if redis_client is not None:
+        try:
+            key = _rate_limit_key(ip_address, today)
+            current = await redis_client.incr(key)
+            if current == 1:
+                # Expire the counter at the end of the UTC day
+                end_of_day = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+                await redis_client.expireat(key, end_of_day)
+
+            # Mirror to SQL in the background flush (admin analytics only)
+            pending_key = (ip_address, today)
+            _pending_search_counts[pending_key] = _pending_search_counts.get(pending_key, 0) + 1
+            logger.debug("Tracked search for IP %s: %d/%d", ip_address, current, FREE_TIER_DAILY_LIMIT)
+            return
+        except redis.RedisError as e:
+            logger.error(f" Redis rate limit tracking failed, falling back to database: {e}")
 
+    try:
         rate_limit = db.query(RateLimit).filter(
             RateLimit.ip_address == ip_address,
             RateLimit.date == today
@@ -264,13 +373,139 @@ def track_search(ip_address: str, db: Session):
             db.add(rate_limit)
 
         db.commit()
-        logger.debug(f"Tracked search for IP {ip_address}: {rate_limit.search_count}/{FREE_TIER_DAILY_LIMIT}")
+        logger.debug("Tracked search for IP %s: %d/%d", ip_address, rate_limit.search_count, FREE_TIER_DAILY_LIMIT)
     except Exception as e:
         db.rollback()
         logger.error(f" Failed to track search for {ip_address}: {e}")
         # Don't raise - tracking failure shouldn't break the search
 
 
+def flush_rate_limit_counts(pending: Dict[tuple, int]) -> bool:
+    """Write Redis-tracked search counts to the rate_limits table in one transaction"""
+    db = SessionLocal()
+    try:
+        for (ip_address, day), increment in pending.items():
+            # Increment in SQL so concurrent writers can't lose each other's counts
+            result = db.execute(
+                update(RateLimit)
+                .where(RateLimit.ip_address == ip_address, RateLimit.date == day)
+                .values(search_count=RateLimit.search_count + increment)
+                .execution_options(synchronize_session=False)
+            )
+
+            if result.rowcount == 0:
+                db.add(RateLimit(
+                    ip_address=ip_address,
+                    search_count=increment,
+                    date=day
+                ))
+
+        db.commit()
+        logger.debug("Flushed rate limit counts for %d IPs", len(pending))
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f" Failed to flush rate limit counts: {e}")
+        return False
+    finally:
+        db.close()
+
+
+async def flush_pending_search_counts():
+    """Hand pending counts to a worker thread; requeue them if the write fails"""
+    if not _pending_search_counts:
+        return
+
+    # Swap on the event loop so concurrent track_search calls aren't lost
+    pending = dict(_pending_search_counts)
+    _pending_search_counts.clear()
+
+    if not await asyncio.to_thread(flush_rate_limit_counts, pending):
+        for pending_key, increment in pending.items():
+            _pending_search_counts[pending_key] = _pending_search_counts.get(pending_key, 0) + increment
+
+        # Don't let a long database outage grow the backlog without bound; drop the oldest days first
+        excess = len(_pending_search_counts) - RATE_LIMIT_PENDING_MAX_KEYS
+        if excess > 0:
+            for stale_key in sorted(_pending_search_counts, key=lambda k: k[1])[:excess]:
+                del _pending_search_counts[stale_key]
+            logger.warning(f"⚠️  Dropped {excess} unflushed rate limit counts (backlog over {RATE_LIMIT_PENDING_MAX_KEYS})")
+
+
+async def rate_limit_flush_loop():
+    """Periodically mirror Redis rate-limit counters into SQL"""
+    while True:
+        await asyncio.sleep(RATE_LIMIT_FLUSH_INTERVAL)
+        await flush_pending_search_counts()
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if redis_client is not None:
+        app.state.rate_limit_flush_task = asyncio.create_task(rate_limit_flush_loop())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    task = getattr(app.state, "rate_limit_flush_task", None)
+    if task:
+        task.cancel()
+    if redis_client is not None:
+        await flush_pending_search_counts()
+        await redis_client.aclose()
+        await redis_pool.disconnect()
+    await _cse_client.aclose()
+
+
+# Window in which repeating a search (e.g. on page refresh) reuses the thread it created
+RECENT_QUERY_WINDOW = timedelta(minutes=5)
+
+
+def _recent_query_key(user_identifier: str, query: str) -> str:
+    """Redis key mapping a user's recent search to its thread id"""
+    digest = hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+    return f"rq:{user_identifier}:{digest}"
+
+
+async def find_recent_thread(user_identifier: str, query: str, db: Session) -> Optional[str]:
+    """Return the id of the thread this user created for the same query within the window, if any"""
+    if redis_client is not None:
+        try:
+            thread_id = await redis_client.get(_recent_query_key(user_identifier, query))
+            if not thread_id:
+                return None
+            # Primary-key check so a thread deleted inside the window isn't reused
+            return db.query(Thread.id).filter(
+                Thread.id == thread_id,
+                Thread.user_id == user_identifier
+            ).scalar()
+        except redis.RedisError as e:
+            logger.error(f" Redis recent-query lookup failed, falling back to database: {e}")
+
+    recent_time = datetime.now(timezone.utc) - RECENT_QUERY_WINDOW
+    # Only the id is needed, so don't hydrate a Thread object
+    return db.query(Thread.id).join(Message).filter(
+        Message.role == 'user',
+        Message.content == query,
+        Thread.created_at >= recent_time,
+        Thread.user_id == user_identifier  # CRITICAL: Ensure user can only reuse their own threads
+    ).order_by(Thread.created_at.desc()).limit(1).scalar()
+
+
+async def remember_recent_thread(user_identifier: str, query: str, thread_id: str):
+    """Record a saved search so find_recent_thread can resolve it without scanning messages"""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(
+            _recent_query_key(user_identifier, query),
+            thread_id,
+            ex=int(RECENT_QUERY_WINDOW.total_seconds())
+        )
+    except redis.RedisError as e:
+        logger.error(f" Failed to record recent query in Redis: {e}")
+
+
 # Pydantic models
 class FollowUpRequest(BaseModel):
     sessionId: str
@@ -342,6 +577,48 @@ class UpdateThreadRequest(BaseModel):
     is_pinned: Optional[bool] = None
 
 
+# Precompiled patterns for format_response_to_markdown (hot path on every response)
+_STAR_BOLD_LINE_RE = re.compile(r'^\s*\*\s+\*\*', re.MULTILINE)
+_STAR_LINE_RE = re.compile(r'^\s*\*\s+', re.MULTILINE)
+_DOUBLE_BOLD_RE = re.compile(r'\*\*\s*\*\*([^*]+?)\*\*\s*\*\*')
+_STAR_BOLD_RE = re.compile(r'\* \*\*')
+_BOLD_COLON_RE = re.compile(r'\*\*\s+:')
+_BOLD_SECTION_RE = re.compile(r'\*\*([A-Z][^*\n]+?):\*\*\s*')
+# Start of a genuine bullet line ("• item", "- item", "* item" but not "* **bold**"); [^\S\n] is in-line whitespace
+_BULLET_START = r'[^\S\n]*(?:[•●○-][^\S\n]+(?=\w)|\* (?!\*\*)[^\S\n]*(?=\S))'
+# A bullet line (content captured), flagging via the empty "list_end" group when the next line is
+# non-list, non-heading text (that line needs a blank line before it)
+_BULLET_LINE_RE = re.compile(
+    rf'^{_BULLET_START}(.*?)[^\S\n]*$(?:(?=\n(?!{_BULLET_START})[^\S\n]*[^\s#])(?P<list_end>))?',
+    re.MULTILINE
+)
+_EXCESS_NEWLINES_RE = re.compile(r'\n{3,}')
+
+# Markdown link captured by StreamingMarkdownBuffer
+_MARKDOWN_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+
+# Leading numbering/bullets on generated related questions
+_QUESTION_NUMBERING_RE = re.compile(r'^[\d\.\-\*\)\]\s]+')
+
+
+# Reused Markdown converter: building the extension chain is most of the cost for short inputs.
+# Only used from the event loop thread (Markdown instances are not thread-safe).
+_MARKDOWN = markdown.Markdown(extensions=['extra', 'nl2br', 'sane_lists', 'fenced_code'])
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_markdown(text: str) -> str:
+    """Convert markdown to HTML, memoized on the exact input text"""
+    return _MARKDOWN.reset().convert(text)
+
+
+def _normalize_bullet_line(match: re.Match) -> str:
+    """Replacement for _BULLET_LINE_RE: "- item", plus a blank line when the list ends before text"""
+    if match.group('list_end') is None:
+        return '- ' + match.group(1)
+    return '- ' + match.group(1) + '\n'
+
+
 def format_response_to_markdown(text: str) -> str:
     """Format raw text into proper markdown and convert to HTML"""
     # Ensure consistent newlines
@@ -349,51 +626,26 @@ def format_response_to_markdown(text: str) -> str:
 
     # Remove excessive asterisks and clean formatting
     # Remove standalone asterisks at line starts
-    processed_text = re.sub(r'^\s*\*\s+\*\*', '**', processed_text, flags=re.MULTILINE)
-    processed_text = re.sub(r'^\s*\*\s+', '', processed_text, flags=re.MULTILINE)
+    processed_text = _STAR_BOLD_LINE_RE.sub('**', processed_text)
+    processed_text = _STAR_LINE_RE.sub('', processed_text)
 
     # Clean up multiple asterisks patterns
-    processed_text = re.sub(r'\*\*\s*\*\*([^*]+?)\*\*\s*\*\*', r'**\1**', processed_text)
-    processed_text = re.sub(r'\* \*\*', '**', processed_text)
-    processed_text = re.sub(r'\*\*\s+:', '**:', processed_text)
+    processed_text = _DOUBLE_BOLD_RE.sub(r'**\1**', processed_text)
+    processed_text = _STAR_BOLD_RE.sub('**', processed_text)
+    processed_text = _BOLD_COLON_RE.sub('**:', processed_text)
 
     # Convert "**Section:**" patterns to headings
-    processed_text = re.sub(r'\*\*([A-Z][^*\n]+?):\*\*\s*', r'\n### \1\n', processed_text)
-
-    # Process bullet points - keep only genuine list items
-    # Convert patterns like "* item" or "- item" but not "* **bold**"
-    lines = processed_text.split('\n')
-    processed_lines = []
-    in_list = False
-
-    for line in lines:
-        stripped = line.strip()
-        # Detect genuine bullet points (not just formatting asterisks)
-        if re.match(r'^[•●○-]\s+\w', stripped) or (stripped.startswith('* ') and not stripped.startswith('* **')):
-            processed_lines.append('- ' + re.sub(r'^[•●○*-]\s+', '', stripped))
-            in_list = True
-        elif stripped and not stripped.startswith('#'):
-            # Add spacing after lists
-            if in_list:
-                processed_lines.append('')
-                in_list = False
-            processed_lines.append(line)
-        else:
-            processed_lines.append(line)
-            in_list = False
+    processed_text = _BOLD_SECTION_RE.sub(r'\n### \1\n', processed_text)
 
-    processed_text = '\n'.join(processed_lines)
+    # Process bullet points - keep only genuine list items, normalized to "- item",
+    # and add spacing after lists
+    processed_text = _BULLET_LINE_RE.sub(_normalize_bullet_line, processed_text)
 
     # Clean up excessive blank lines
-    processed_text = re.sub(r'\n{3,}', '\n\n', processed_text)
+    processed_text = _EXCESS_NEWLINES_RE.sub('\n\n', processed_text)
 
     # Convert markdown to HTML with proper extensions
-    html = markdown.markdown(
-        processed_text.strip(),
-        extensions=['extra', 'nl2br', 'sane_lists', 'fenced_code']
-    )
-
-    return html
+    return _render_markdown(processed_text.strip())
 
 
 class StreamingMarkdownBuffer:
@@ -471,7 +723,7 @@ class StreamingMarkdownBuffer:
             if self.in_link_url:
                 self.link_buffer += self.buffer[i]
                 if self.buffer[i] == ')':
-                    match = re.match(r'\[([^\]]+)\]\(([^\)]+)\)', self.link_buffer)
+                    match = _MARKDOWN_LINK_RE.match(self.link_buffer)
                     if match:
                         text, url = match.groups()
                         output += f'<a href="{html.escape(url)}" target="_blank" rel="noopener noreferrer">{html.escape(text)}</a>'
@@ -522,39 +774,46 @@ class StreamingMarkdownBuffer:
         return ""
 
 
+def _grounding_metadata(response):
+    """Return (chunks, supports) from the first candidate's grounding metadata"""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return [], []
+    metadata = getattr(candidates[0], 'grounding_metadata', None)
+    if not metadata:
+        return [], []
+    return getattr(metadata, 'grounding_chunks', None) or [], getattr(metadata, 'grounding_supports', None) or []
+
+
 def extract_sources(response) -> List[Source]:
     """Extract sources from grounding metadata"""
     source_map = {}
 
     try:
-        # Get grounding metadata from response
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                metadata = candidate.grounding_metadata
-
-                chunks = metadata.grounding_chunks if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks else []
-                supports = metadata.grounding_supports if hasattr(metadata, 'grounding_supports') and metadata.grounding_supports else []
-
-                for index, chunk in enumerate(chunks):
-                    if hasattr(chunk, 'web') and chunk.web:
-                        uri = chunk.web.uri if hasattr(chunk.web, 'uri') else None
-                        title = chunk.web.title if hasattr(chunk.web, 'title') else None
-
-                        if uri and title and uri not in source_map:
-                            # Find snippets that reference this chunk
-                            snippets = []
-                            for support in supports:
-                                if hasattr(support, 'grounding_chunk_indices'):
-                                    if index in support.grounding_chunk_indices:
-                                        if hasattr(support, 'segment') and hasattr(support.segment, 'text'):
-                                            snippets.append(support.segment.text)
-
-                            source_map[uri] = Source(
-                                title=title,
-                                url=uri,
-                                snippet=' '.join(snippets) if snippets else ''
-                            )
+        chunks, supports = _grounding_metadata(response)
+
+        # Invert supports once so each chunk finds its snippets in O(1)
+        snippets_by_chunk = {}
+        for support in supports:
+            segment_text = getattr(getattr(support, 'segment', None), 'text', None)
+            if segment_text is None:
+                continue
+            for chunk_index in getattr(support, 'grounding_chunk_indices', None) or ():
+                snippets_by_chunk.setdefault(chunk_index, []).append(segment_text)
+
+        for index, chunk in enumerate(chunks):
+            web = getattr(chunk, 'web', None)
+            if not web:
+                continue
+            uri = getattr(web, 'uri', None)
+            title = getattr(web, 'title', None)
+
+            if uri and title and uri not in source_map:
+                source_map[uri] = Source(
+                    title=title,
+                    url=uri,
+                    snippet=' '.join(snippets_by_chunk.get(index, ()))
+                )
     except Exception as e:
         logger.error(f"Error extracting sources: {e}")
 
@@ -568,54 +827,53 @@ def extract_sources_with_citations(response) -> tuple[List[Source], Dict[str, Li
     source_index_map = {}  # {uri: index} to track source positions
 
     try:
-        # Get grounding metadata from response
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                metadata = candidate.grounding_metadata
-
-                chunks = metadata.grounding_chunks if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks else []
-                supports = metadata.grounding_supports if hasattr(metadata, 'grounding_supports') and metadata.grounding_supports else []
-
-                # First pass: Build source list
-                for chunk_index, chunk in enumerate(chunks):
-                    if hasattr(chunk, 'web') and chunk.web:
-                        uri = chunk.web.uri if hasattr(chunk.web, 'uri') else None
-                        title = chunk.web.title if hasattr(chunk.web, 'title') else None
-
-                        if uri and title and uri not in source_index_map:
-                            source_index = len(source_list)
-                            source_index_map[uri] = source_index
-                            source_list.append(Source(
-                                title=title,
-                                url=uri,
-                                snippet=''
-                            ))
-
-                # Second pass: Build citation map
-                for support in supports:
-                    if hasattr(support, 'segment') and hasattr(support.segment, 'text'):
-                        segment_text = support.segment.text
-                        if hasattr(support, 'grounding_chunk_indices') and support.grounding_chunk_indices:
-                            # Map chunk indices to source indices
-                            source_indices = []
-                            for chunk_idx in support.grounding_chunk_indices:
-                                if chunk_idx < len(chunks):
-                                    chunk = chunks[chunk_idx]
-                                    if hasattr(chunk, 'web') and chunk.web and hasattr(chunk.web, 'uri'):
-                                        uri = chunk.web.uri
-                                        if uri in source_index_map:
-                                            source_idx = source_index_map[uri]
-                                            if source_idx not in source_indices:
-                                                source_indices.append(source_idx)
-
-                            if source_indices:
-                                # Store 1-indexed citations for display
-                                citation_map[segment_text] = [idx + 1 for idx in sorted(source_indices)]
+        chunks, supports = _grounding_metadata(response)
+
+        # First pass: Build source list
+        chunk_uris = {}  # {chunk_index: uri}
+        for chunk_index, chunk in enumerate(chunks):
+            web = getattr(chunk, 'web', None)
+            if not web:
+                continue
+            uri = getattr(web, 'uri', None)
+            title = getattr(web, 'title', None)
+            chunk_uris[chunk_index] = uri
+
+            if uri and title and uri not in source_index_map:
+                source_index_map[uri] = len(source_list)
+                source_list.append(Source(
+                    title=title,
+                    url=uri,
+                    snippet=''
+                ))
+
+        # Resolve each chunk to its source once instead of per support
+        chunk_source_index = {
+            chunk_index: source_index_map[uri]
+            for chunk_index, uri in chunk_uris.items()
+            if uri in source_index_map
+        }
+
+        # Second pass: Build citation map
+        for support in supports:
+            segment_text = getattr(getattr(support, 'segment', None), 'text', None)
+            chunk_indices = getattr(support, 'grounding_chunk_indices', None)
+            if segment_text is None or not chunk_indices:
+                continue
+
+            # Map chunk indices to source indices
+            source_indices = {
+                chunk_source_index[chunk_idx]
+                for chunk_idx in chunk_indices
+                if chunk_idx in chunk_source_index
+            }
+
+            if source_indices:
+                # Store 1-indexed citations for display
+                citation_map[segment_text] = [idx + 1 for idx in sorted(source_indices)]
 
     except Exception as e:
         logger.error(f"Error extracting sources with citations: {e}")
-        import traceback
         traceback.print_exc()
 
     return source_list, citation_map
@@ -640,8 +898,13 @@ def inject_inline_citations(text: str, citation_map: Dict[str, List[int]]) -> st
 
 
 def generate_session_id() -> str:
-    """Generate a random session ID"""
-    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=7))
+    """Generate a random 7-character URL-safe session ID"""
+    return secrets.token_urlsafe(5)
+
+
+def generate_share_id() -> str:
+    """Generate an unguessable 12-char share ID for public links"""
+    return secrets.token_urlsafe(9)
 
 
 def generate_thread_title(query: str) -> str:
@@ -676,10 +939,7 @@ Format: Return ONLY the questions, one per line, without numbering or bullet poi
         response = client.models.generate_content(
             model=GEMINI_MODEL,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=GEMINI_RELATED_QUESTIONS_TEMPERATURE,
-                max_output_tokens=GEMINI_RELATED_QUESTIONS_MAX_TOKENS,
-            )
+            config=RELATED_QUESTIONS_CONFIG
         )
 
         # Parse the response
@@ -689,7 +949,7 @@ Format: Return ONLY the questions, one per line, without numbering or bullet poi
         questions = [q.strip() for q in questions_text.split('\n') if q.strip()]
 
         # Remove numbering if present (1., 2., -, *, etc.)
-        questions = [re.sub(r'^[\d\.\-\*\)\]\s]+', '', q).strip() for q in questions]
+        questions = [_QUESTION_NUMBERING_RE.sub('', q).strip() for q in questions]
 
         # Filter out empty or very short questions
         questions = [q for q in questions if len(q) > 10]
@@ -703,6 +963,35 @@ Format: Return ONLY the questions, one per line, without numbering or bullet poi
         return []
 
 
+# Conversational patterns (greetings, jokes, simple chat), combined into one alternation
+CONVERSATIONAL_PATTERNS = [
+    # Greetings
+    r'^(hi|hello|hey|howdy|greetings|good morning|good afternoon|good evening)[\s,!.]*$',
+    r'^(hi|hello|hey)\s+(there|friend|buddy)',
+    r'^how\s+(are|r)\s+you',
+    r'^what\'?s\s+up',
+    r'^sup\b',
+
+    # Jokes and fun
+    r'tell\s+(me\s+)?a\s+joke',
+    r'make\s+me\s+laugh',
+    r'say\s+something\s+funny',
+
+    # Simple questions about the AI
+    r'^who\s+are\s+you',
+    r'^what\s+are\s+you',
+    r'^what\s+can\s+you\s+do',
+    r'^help\s*$',
+
+    # Thank you / goodbye
+    r'^(thanks|thank\s+you|thx|ty)[\s!.]*$',
+    r'^(bye|goodbye|see\s+you|later)[\s!.]*$',
+]
+_CONVERSATIONAL_RE = re.compile('|'.join(f'(?:{p})' for p in CONVERSATIONAL_PATTERNS))
+_QUESTION_WORDS = frozenset(['what', 'when', 'where', 'who', 'why', 'how', 'which'])
+_CASUAL_WORDS = frozenset(['hi', 'hello', 'hey', 'yo', 'sup', 'hola', 'thanks', 'bye'])
+
+
 def is_conversational_query(query: str) -> bool:
     """
     Detect if a query is conversational (greetings, jokes, simple chat)
@@ -710,55 +999,45 @@ def is_conversational_query(query: str) -> bool:
     """
     query_lower = query.lower().strip()
 
-    # Conversational patterns
-    conversational_patterns = [
-        # Greetings
-        r'^(hi|hello|hey|howdy|greetings|good morning|good afternoon|good evening)[\s,!.]*$',
-        r'^(hi|hello|hey)\s+(there|friend|buddy)',
-        r'^how\s+(are|r)\s+you',
-        r'^what\'?s\s+up',
-        r'^sup\b',
-
-        # Jokes and fun
-        r'tell\s+(me\s+)?a\s+joke',
-        r'make\s+me\s+laugh',
-        r'say\s+something\s+funny',
-
-        # Simple questions about the AI
-        r'^who\s+are\s+you',
-        r'^what\s+are\s+you',
-        r'^what\s+can\s+you\s+do',
-        r'^help\s*$',
-
-        # Thank you / goodbye
-        r'^(thanks|thank\s+you|thx|ty)[\s!.]*$',
-        r'^(bye|goodbye|see\s+you|later)[\s!.]*$',
-    ]
-
-    # Check if query matches any conversational pattern
-    for pattern in conversational_patterns:
-        if re.search(pattern, query_lower):
-            return True
+    # Check if query matches any conversational pattern (single combined scan)
+    if _CONVERSATIONAL_RE.search(query_lower):
+        return True
 
     # Very short queries (1-2 words) without question words might be conversational
     words = query_lower.split()
-    if len(words) <= 2 and not any(qw in words for qw in ['what', 'when', 'where', 'who', 'why', 'how', 'which']):
+    if len(words) <= 2 and _QUESTION_WORDS.isdisjoint(words):
         # Check if it's likely a casual greeting/chat
-        casual_words = ['hi', 'hello', 'hey', 'yo', 'sup', 'hola', 'thanks', 'bye']
-        if any(word in casual_words for word in words):
+        if not _CASUAL_WORDS.isdisjoint(words):
             return True
 
     return False
 
 
-def fetch_google_custom_search(
+FAVICON_SERVICE_URL = "https://www.google.com/s2/favicons?domain="
+
+
+def _extract_netloc(url: str) -> str:
+    """Cheap equivalent of urlparse(url).netloc for the absolute URLs returned by CSE"""
+    start = url.find('://')
+    if start == -1:
+        return ''
+    start += 3
+    end = len(url)
+    for sep in '/?#':
+        idx = url.find(sep, start)
+        if idx != -1 and idx < end:
+            end = idx
+    return url[start:end]
+
+
+async def fetch_google_custom_search(
     query: str,
     num_results: int = 10,
     date_filter: Optional[str] = None,
     file_type: Optional[str] = None,
     filter_params: Optional[Dict] = None
-) -> List[Source]:
-    """Fetch search results from Google Custom Search API with rich metadata and filters"""
+) -> List[Dict]:
+    """Fetch search results from Google Custom Search API as Source-shaped dicts for the RAG pipeline"""
     if not GOOGLE_SEARCH_ENGINE_ID:
         logger.warning("⚠️  Google Custom Search Engine ID not configured, falling back to Gemini grounding")
         return []
@@ -783,7 +1062,7 @@ def fetch_google_custom_search(
         if filter_params:
             params.update(filter_params)
 
-        response = requests.get(CUSTOM_SEARCH_API_URL, params=params, timeout=API_REQUEST_TIMEOUT)
+        response = await _cse_client.get(CUSTOM_SEARCH_API_URL, params=params)
         response.raise_for_status()
         data = response.json()
 
@@ -792,53 +1071,45 @@ def fetch_google_custom_search(
 
         for item in items:
             # Extract basic info
-            title = item.get('title', '')
             url = item.get('link', '')
-            snippet = item.get('snippet', '')
+            pagemap = item.get('pagemap') or {}
+            metatags = pagemap.get('metatags') or []
 
             # Extract image (from pagemap or og:image)
             image = None
-            pagemap = item.get('pagemap', {})
-            if 'cse_image' in pagemap and len(pagemap['cse_image']) > 0:
-                image = pagemap['cse_image'][0].get('src')
-            elif 'metatags' in pagemap and len(pagemap['metatags']) > 0:
-                metatags = pagemap['metatags'][0]
-                image = metatags.get('og:image') or metatags.get('twitter:image')
-
-            # Extract favicon
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc
-            favicon = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
-
-            # Extract display URL (clean domain)
-            display_url = domain.replace('www.', '')
+            cse_images = pagemap.get('cse_image')
+            if cse_images:
+                image = cse_images[0].get('src')
+            elif metatags:
+                image = metatags[0].get('og:image') or metatags[0].get('twitter:image')
 
             # Extract publish date (if available)
             publish_date = None
-            if 'pagemap' in item and 'metatags' in item['pagemap']:
-                for metatag in item['pagemap']['metatags']:
-                    publish_date = (
-                        metatag.get('article:published_time') or
-                        metatag.get('datePublished') or
-                        metatag.get('og:updated_time')
-                    )
-                    if publish_date:
-                        break
-
-            sources.append(Source(
-                title=title,
-                url=url,
-                snippet=snippet,
-                image=image,
-                favicon=favicon,
-                displayUrl=display_url,
-                publishDate=publish_date
-            ))
+            for metatag in metatags:
+                publish_date = (
+                    metatag.get('article:published_time') or
+                    metatag.get('datePublished') or
+                    metatag.get('og:updated_time')
+                )
+                if publish_date:
+                    break
+
+            domain = _extract_netloc(url)
+
+            sources.append({
+                'title': item.get('title', ''),
+                'url': url,
+                'snippet': item.get('snippet', ''),
+                'image': image,
+                'favicon': FAVICON_SERVICE_URL + domain + '&sz=64',
+                'displayUrl': domain.replace('www.', ''),  # Clean display domain
+                'publishDate': publish_date,
+            })
 
         logger.info(f" Fetched {len(sources)} sources from Google Custom Search API")
         return sources
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f" Error fetching from Custom Search API: {e}")
         return []
     except Exception as e:
@@ -846,16 +1117,56 @@ def fetch_google_custom_search(
         return []
 
 
+def sse_event(payload: dict) -> str:
+    """Serialize a payload as a Server-Sent Events data frame"""
+    return "data: " + orjson.dumps(payload).decode() + "\n\n"
+
+
+def build_conversation_history(messages: List[Message]) -> Tuple[List[Dict], List[str]]:
+    """
+    Convert stored thread messages to Gemini conversation history
+    Returns: (conversation_history, context_summary)
+    """
+    conversation_history = []
+    context_summary = []
+
+    for msg in messages:
+        if msg.role == 'user':
+            conversation_history.append({"role": "user", "parts": [{"text": msg.content}]})
+            context_summary.append(f"User: {msg.content}")
+        else:
+            # Extract plain text from HTML for assistant messages
+            plain_text = BeautifulSoup(msg.content, 'html.parser').get_text()
+            conversation_history.append({"role": "model", "parts": [{"text": plain_text}]})
+            context_summary.append(f"Assistant: {plain_text[:200]}...")  # Summary for context
+
+    return conversation_history, context_summary
+
+
+# Constant SSE frames (identical bytes on every request)
+_SSE_EMPTY_SOURCES = sse_event({'type': 'sources', 'sources': []})
+_SSE_EMPTY_RELATED = sse_event({'type': 'related_questions', 'questions': []})
+_SSE_DONE = sse_event({'type': 'done'})
+
+
 @app.get("/")
 async def root():
     return {"message": "Gemini Search API is running"}
 
 
+_HEALTH_CHECK_STMT = text("SELECT 1")
+
+
+def _ping_database():
+    """Run SELECT 1 on a pooled connection, without a transactional ORM session"""
+    with engine.connect() as conn:
+        conn.execute(_HEALTH_CHECK_STMT).scalar()
+
+
 @app.get("/health")
 @app.get("/api/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """Health check endpoint for monitoring"""
-    from sqlalchemy import text
     health_status = {
         "status": "healthy",
         "version": "0.1.0",
@@ -864,7 +1175,7 @@ async def health_check(db: Session = Depends(get_db)):
 
     # Check database connection
     try:
-        db.execute(text("SELECT 1"))
+        await asyncio.to_thread(_ping_database)
         health_status["database"] = "connected"
     except Exception as e:
         health_status["database"] = f"error: {str(e)}"
@@ -932,12 +1243,13 @@ async def search_stream(
 
         # Free tier: check rate limit
         if not is_browser_user:
-            if check_rate_limit(user_identifier, db):
+            if await check_rate_limit(user_identifier, db):
                 error_msg = f"Daily search limit ({FREE_TIER_DAILY_LIMIT} searches) exceeded. Please try again tomorrow."
-                yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
+                yield sse_event({'type': 'error', 'message': error_msg})
                 return
 
         logger.info(f"🔐 User: {'Browser Pro' if is_browser_user else 'Free tier'} | ID: {user_identifier}")
+        cse_task = None
         try:
             # Initialize engines
             citation_engine = CitationEngine()
@@ -956,8 +1268,7 @@ async def search_stream(
             use_pro_search = pro_search or pro_engine.should_use_pro_search(q, user_requested=pro_search)
             if use_pro_search:
                 logger.info(f"🚀 Pro Search activated for complex query")
-                yield f"data: {json.dumps({'type': 'status', 'message': '🚀 Pro Search activated - Deep research mode'})}\n\n"
-                await asyncio.sleep(0.01)
+                yield sse_event({'type': 'status', 'message': '🚀 Pro Search activated - Deep research mode'})
 
             # Process search filters
             include_domains_list = [d.strip() for d in include_domains.split(',')] if include_domains else None
@@ -988,7 +1299,7 @@ async def search_stream(
 
             # Validate query
             if not q:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Query parameter q is required'})}\n\n"
+                yield sse_event({'type': 'error', 'message': 'Query parameter q is required'})
                 return
 
             # Process query to understand intent and enhance
@@ -997,24 +1308,38 @@ async def search_stream(
                   f"keywords={query_analysis['keywords'][:5]}")
             logger.info(f"🔍 Enhanced query: {query_analysis['enhanced_query']}")
 
+            # Kick off the web search now so it overlaps thread lookup/creation below
+            is_conversational = is_conversational_query(q)
+            if not is_conversational:
+                # Use enhanced query for better search results
+                search_query = query_analysis['enhanced_query']
+
+                # Apply filter modifications to query (domain filters, etc.)
+                if 'q_append' in filter_params:
+                    search_query = filter_manager.apply_filters_to_query(search_query, filter_params)
+
+                # Google API free tier allows max 10 results per query
+                num_sources_to_fetch = 10
+                cse_task = asyncio.create_task(fetch_google_custom_search(
+                    search_query,
+                    num_results=num_sources_to_fetch,
+                    date_filter=filter_params.get('dateRestrict'),
+                    file_type=filter_params.get('fileType')
+                ))
+                # Let the task send its request before the synchronous work below
+                await asyncio.sleep(0)
+
             # Generate session and thread IDs
             session_id = generate_session_id()
-            yield f"data: {json.dumps({'type': 'session_id', 'sessionId': session_id})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'session_id', 'sessionId': session_id})
 
             # Check for existing thread (prevent duplicates on refresh)
-            recent_time = datetime.now(timezone.utc) - timedelta(minutes=5)
-            existing_thread = db.query(Thread).join(Message).filter(
-                Message.role == 'user',
-                Message.content == q,
-                Thread.created_at >= recent_time,
-                Thread.user_id == user_identifier  # CRITICAL: Ensure user can only reuse their own threads
-            ).order_by(Thread.created_at.desc()).first()
-
-            if existing_thread:
-                new_thread = existing_thread
-                logger.info(f"♻️  Reusing existing thread {existing_thread.id}")
-                yield f"data: {json.dumps({'type': 'thread_id', 'threadId': new_thread.id})}\n\n"
+            existing_thread_id = await find_recent_thread(user_identifier, q, db)
+
+            if existing_thread_id:
+                thread_id = existing_thread_id
+                logger.info(f"♻️  Reusing existing thread {existing_thread_id}")
+                yield sse_event({'type': 'thread_id', 'threadId': thread_id})
             else:
                 # Create new thread
                 thread_title = generate_thread_title(q)
@@ -1026,44 +1351,28 @@ async def search_stream(
                 )
                 db.add(new_thread)
                 db.flush()
-                logger.info(f" Created new thread {new_thread.id}")
-                yield f"data: {json.dumps({'type': 'thread_id', 'threadId': new_thread.id})}\n\n"
-
-            await asyncio.sleep(0.01)
+                thread_id = new_thread.id
+                logger.info(f" Created new thread {thread_id}")
+                yield sse_event({'type': 'thread_id', 'threadId': thread_id})
 
             # STEP 1: Fetch sources FIRST (for proper grounding)
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Searching web...'})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'status', 'message': 'Searching web...'})
 
             sources = []
             sources_dict = []
             total_reviewed = 0  # Initialize to handle API failures gracefully
 
-            if not is_conversational_query(q):
-                # Use enhanced query for better search results
-                search_query = query_analysis['enhanced_query']
-
-                # Apply filter modifications to query (domain filters, etc.)
-                if 'q_append' in filter_params:
-                    search_query = filter_manager.apply_filters_to_query(search_query, filter_params)
-
+            if cse_task is not None:
                 # Get search hints based on query intent
                 search_hints = query_processor.get_search_hints(
                     query_analysis['intent'],
                     query_analysis['temporal_context']
                 )
 
-                logger.debug(f"🎯 Search hints: {search_hints}")
+                logger.debug("🎯 Search hints: %s", search_hints)
 
-                # Fetch sources before generating response with enhanced query and filters
-                # Google API free tier allows max 10 results per query
-                num_sources_to_fetch = 10
-                raw_sources = fetch_google_custom_search(
-                    search_query,
-                    num_results=num_sources_to_fetch,
-                    date_filter=filter_params.get('dateRestrict'),
-                    file_type=filter_params.get('fileType')
-                )
+                # Sources must arrive before generating the grounded response
+                raw_sources = await cse_task
 
                 if use_pro_search:
                     logger.info(f"📚 Pro Search: Fetching {num_sources_to_fetch} sources for comprehensive research")
@@ -1071,41 +1380,24 @@ async def search_stream(
                 if raw_sources and len(raw_sources) > 0:
                     logger.info(f" Fetched {len(raw_sources)} raw sources from Custom Search API")
 
-                    # Convert to dicts for processing
-                    raw_sources_dict = []
-                    for source in raw_sources:
-                        if hasattr(source, 'model_dump'):
-                            raw_sources_dict.append(source.model_dump())
-                        else:
-                            raw_sources_dict.append({
-                                'title': source.title,
-                                'url': source.url,
-                                'snippet': source.snippet,
-                                'image': source.image if hasattr(source, 'image') else None,
-                                'favicon': source.favicon if hasattr(source, 'favicon') else None,
-                                'displayUrl': source.displayUrl if hasattr(source, 'displayUrl') else None,
-                                'publishDate': source.publishDate if hasattr(source, 'publishDate') else None,
-                            })
-
-                    # Apply RAG pipeline: deduplicate, rank, and filter
-                    deduped_sources = rag_pipeline.deduplicate_sources(raw_sources_dict)
-                    logger.info(f" Deduplicated to {len(deduped_sources)} unique sources")
-
                     # Pro Search uses more sources for comprehensive answers
                     max_sources_to_use = 15 if use_pro_search else 10
 
-                    ranked_sources, total_reviewed = rag_pipeline.process_sources(
-                        deduped_sources,
-                        q,
-                        max_sources=max_sources_to_use
-                    )
-
                     # Filter out very low quality sources (lower threshold for Pro Search)
                     min_quality_score = 0.15 if use_pro_search else 0.2
-                    filtered_sources = rag_pipeline.filter_low_quality_sources(ranked_sources, min_score=min_quality_score)
+
+                    # Apply RAG pipeline: deduplicate, rank, filter and enhance in one pass
+                    filtered_sources, total_reviewed = rag_pipeline.ingest(
+                        raw_sources,
+                        q,
+                        max_sources=max_sources_to_use,
+                        min_score=min_quality_score
+                    )
+                    logger.info(f" Deduplicated to {total_reviewed} unique sources")
 
                     sources_dict = filtered_sources
-                    sources = [Source(**src) for src in sources_dict]
+                    # Dicts were built by our own pipeline, so skip re-validation
+                    sources = [Source.model_construct(**src) for src in sources_dict]
 
                     logger.info(f" Ranked and filtered to {len(sources)} high-quality sources")
                     logger.info(f"📊 Total sources reviewed: {total_reviewed}")
@@ -1114,14 +1406,13 @@ async def search_stream(
                         logger.info(f"📚 Pro Search: Using {len(sources)} sources for comprehensive synthesis")
 
                 status_msg = f'🚀 Pro Search: Reviewed {total_reviewed} sources, selected {len(sources)} for deep analysis' if use_pro_search else f'Reviewed {total_reviewed} sources, selected {len(sources)} best matches'
-                yield f"data: {json.dumps({'type': 'status', 'message': status_msg})}\n\n"
-                await asyncio.sleep(0.01)
+                yield sse_event({'type': 'status', 'message': status_msg})
 
             # Apply focus mode to sources if not default web mode
             if mode != 'web' and sources_dict:
                 logger.info(f"🎯 Applying {mode} focus mode to sources")
                 sources_dict = focus_manager._filter_sources_by_mode(sources_dict, focus_mode)
-                sources = [Source(**src) for src in sources_dict]
+                sources = [Source.model_construct(**src) for src in sources_dict]
                 logger.info(f" Focus mode applied, {len(sources_dict)} sources after filtering")
 
             # STEP 2: Build grounded prompt with sources
@@ -1154,44 +1445,36 @@ Make this answer notably more thorough and insightful than a standard response.
                 formatted_query += pro_enhancement
                 logger.info(f"🚀 Applied Pro Search enhancement to prompt")
 
-            # Configure Gemini (without grounding tool since we're doing it manually)
-            config = types.GenerateContentConfig(
-                temperature=GEMINI_TEMPERATURE,
-                top_p=GEMINI_TOP_P,
-                top_k=GEMINI_TOP_K,
-                max_output_tokens=GEMINI_MAX_OUTPUT_TOKENS,
-            )
-
             # STEP 3: Stream the grounded response
             full_text = ""
             markdown_buffer = StreamingMarkdownBuffer()
 
             logger.info(f"🔄 Starting streaming for query: {q}")
 
-            for chunk in client.models.generate_content_stream(
+            async for chunk in await client.aio.models.generate_content_stream(
                 model=GEMINI_MODEL,
                 contents=formatted_query,
-                config=config
+                config=GEMINI_CONFIG
             ):
-                if hasattr(chunk, 'text') and chunk.text:
-                    full_text += chunk.text
-                    formatted_chunk = markdown_buffer.process_chunk(chunk.text)
+                # .text is a computed property on the SDK response; read it once per chunk
+                chunk_text = getattr(chunk, 'text', None)
+                if chunk_text:
+                    full_text += chunk_text
+                    formatted_chunk = markdown_buffer.process_chunk(chunk_text)
                     if formatted_chunk:
-                        yield f"data: {json.dumps({'type': 'token', 'content': formatted_chunk})}\n\n"
-                    await asyncio.sleep(0.01)
+                        yield sse_event({'type': 'token', 'content': formatted_chunk})
 
                 # Keep last chunk for metadata
                 full_response = chunk
 
             remaining = markdown_buffer.flush()
             if remaining:
-                yield f"data: {json.dumps({'type': 'token', 'content': remaining})}\n\n"
+                yield sse_event({'type': 'token', 'content': remaining})
 
             logger.info(f" Streaming complete. Total length: {len(full_text)}")
 
             # STEP 4: Validate grounding and inject citations
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Processing citations...'})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'status', 'message': 'Processing citations...'})
 
             # Format initial text to markdown/HTML
             formatted_text_no_citations = format_response_to_markdown(full_text)
@@ -1219,17 +1502,28 @@ Make this answer notably more thorough and insightful than a standard response.
                 )
 
                 # Display all sources searched (not just cited ones) for transparency
-                sources = [Source(**src) for src in all_sources]
+                sources = [Source.model_construct(**src) for src in all_sources]
                 logger.info(f" Processed {len(all_sources)} sources with citations")
             else:
                 formatted_text = formatted_text_no_citations
                 logger.info("💬 No sources to cite (conversational query)")
 
+            # Serialize sources once for both the database row and the SSE frame
+            sources_payload = [s.model_dump() for s in sources]
+
+            # Generate related questions in the background while the response is persisted
+            # (greetings and small talk don't need follow-up suggestions)
+            related_task = None
+            if not is_conversational:
+                related_task = asyncio.create_task(asyncio.to_thread(
+                    generate_related_questions, q, formatted_text
+                ))
+
             # Save to database (only if new thread)
-            if not existing_thread:
+            if not existing_thread_id:
                 try:
                     user_message = Message(
-                        thread_id=new_thread.id,
+                        thread_id=thread_id,
                         role='user',
                         content=q,
                         sources=None
@@ -1237,46 +1531,51 @@ Make this answer notably more thorough and insightful than a standard response.
                     db.add(user_message)
 
                     assistant_message = Message(
-                        thread_id=new_thread.id,
+                        thread_id=thread_id,
                         role='assistant',
                         content=formatted_text,
-                        sources=[s.model_dump() for s in sources] if sources else []
+                        sources=sources_payload
                     )
                     db.add(assistant_message)
                     db.commit()
-                    logger.info(f" Saved messages to thread {new_thread.id}")
+                    logger.info(f" Saved messages to thread {thread_id}")
+                    await remember_recent_thread(user_identifier, q, thread_id)
+                    await invalidate_thread_caches(user_identifier)
                 except Exception as e:
                     db.rollback()
                     logger.error(f" Failed to save messages to database: {e}")
                     # Continue execution - the search already completed, just logging failed
 
             # Send sources
-            yield f"data: {json.dumps({'type': 'sources', 'sources': [s.model_dump() for s in sources]})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'sources', 'sources': sources_payload})
 
             # Conversation history is now stored in database only
             # No need for separate session storage
 
-            # Generate related questions
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Generating suggestions...'})}\n\n"
-            related_questions = generate_related_questions(q, formatted_text)
-            yield f"data: {json.dumps({'type': 'related_questions', 'questions': related_questions})}\n\n"
-            await asyncio.sleep(0.01)
+            # Send related questions
+            if related_task is not None:
+                yield sse_event({'type': 'status', 'message': 'Generating suggestions...'})
+                yield sse_event({'type': 'related_questions', 'questions': await related_task})
+            else:
+                yield _SSE_EMPTY_RELATED
 
             # Track search for free tier users
             if not is_browser_user:
-                track_search(user_identifier, db)
+                await track_search(user_identifier, db)
                 logger.info(f"📊 Free tier search tracked for {user_identifier}")
 
             # Send completion
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield _SSE_DONE
             logger.info(f" Streaming session {session_id} completed")
 
         except Exception as e:
             logger.error(f" Streaming error: {e}")
-            import traceback
             traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'message': str(e)})
+        finally:
+            # Don't leave a search running (and billed) if we bailed out before awaiting it
+            if cse_task is not None and not cse_task.done():
+                cse_task.cancel()
 
     return StreamingResponse(
         generate(),
@@ -1309,13 +1608,14 @@ async def follow_up_stream(
 
         # Free tier: check rate limit
         if not is_browser_user:
-            if check_rate_limit(user_identifier, db):
+            if await check_rate_limit(user_identifier, db):
                 error_msg = f"Daily search limit ({FREE_TIER_DAILY_LIMIT} searches) exceeded. Please try again tomorrow."
-                yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
+                yield sse_event({'type': 'error', 'message': error_msg})
                 return
 
         logger.info(f"🔐 Follow-up from: {'Browser Pro' if is_browser_user else 'Free tier'} | ID: {user_identifier}")
 
+        cse_task = None
         try:
             # Initialize engines
             citation_engine = CitationEngine()
@@ -1350,122 +1650,100 @@ async def follow_up_stream(
 
             # Validate inputs
             if not body.sessionId or not body.query:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Both sessionId and query are required'})}\n\n"
+                yield sse_event({'type': 'error', 'message': 'Both sessionId and query are required'})
                 return
 
             # Process query
             query_analysis = query_processor.process_query(body.query)
             logger.info(f"📝 Follow-up query analysis: intent={query_analysis['intent']}")
 
-            # Get conversation history from database using session_id
-            thread = None
-            if body.threadId:
+            # Kick off the web search now so it overlaps loading/parsing the thread and its history
+            is_conversational = is_conversational_query(body.query)
+            if not is_conversational:
+                # Use enhanced query for better search
+                search_query = query_analysis['enhanced_query']
+
+                # Apply filter modifications to query
+                if 'q_append' in filter_params:
+                    search_query = filter_manager.apply_filters_to_query(search_query, filter_params)
+
+                # Google API free tier allows max 10 results per query
+                cse_task = asyncio.create_task(fetch_google_custom_search(
+                    search_query,
+                    num_results=10,
+                    date_filter=filter_params.get('dateRestrict'),
+                    file_type=filter_params.get('fileType')
+                ))
+                # Let the task send its request before the history work below
+                await asyncio.sleep(0)
+
+            # Get the thread and its messages (one query) and build the conversation history,
+            # off the event loop so the search progresses
+            def load_thread():
                 # CRITICAL: Verify thread ownership
-                thread = db.query(Thread).filter(
-                    Thread.id == body.threadId,
+                query = db.query(Thread).options(joinedload(Thread.messages)).filter(
                     Thread.user_id == user_identifier
-                ).first()
-            elif body.sessionId:
-                # Try to find thread by session_id - CRITICAL: Verify ownership
-                thread = db.query(Thread).filter(
-                    Thread.session_id == body.sessionId,
-                    Thread.user_id == user_identifier
-                ).order_by(Thread.created_at.desc()).first()
+                )
+                if body.threadId:
+                    thread = query.filter(Thread.id == body.threadId).first()
+                else:
+                    # Try to find thread by session_id
+                    thread = query.filter(
+                        Thread.session_id == body.sessionId
+                    ).order_by(Thread.created_at.desc()).first()
+
+                if not thread:
+                    return None, [], ([], [])
+                # Thread.messages is ordered by created_at
+                return thread, thread.messages, build_conversation_history(thread.messages)
+
+            thread, messages, (conversation_history, context_summary) = await asyncio.to_thread(load_thread)
 
             if not thread:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Thread not found. Please start a new search.'})}\n\n"
+                yield sse_event({'type': 'error', 'message': 'Thread not found. Please start a new search.'})
                 return
 
-            # Build conversation history from database messages
-            messages = db.query(Message).filter(Message.thread_id == thread.id).order_by(Message.created_at.asc()).all()
-
             if not messages:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'No conversation history found'})}\n\n"
+                yield sse_event({'type': 'error', 'message': 'No conversation history found'})
                 return
 
-            # Convert to Gemini format for conversation history
-            conversation_history = []
-            context_summary = []
-
-            for msg in messages:
-                if msg.role == 'user':
-                    conversation_history.append({"role": "user", "parts": [{"text": msg.content}]})
-                    context_summary.append(f"User: {msg.content}")
-                else:
-                    # Extract plain text from HTML for assistant messages
-                    plain_text = BeautifulSoup(msg.content, 'html.parser').get_text()
-                    conversation_history.append({"role": "model", "parts": [{"text": plain_text}]})
-                    context_summary.append(f"Assistant: {plain_text[:200]}...")  # Summary for context
-
             conversation_context = "\n".join(context_summary[-4:])  # Last 2 exchanges
             logger.info(f" Loaded {len(conversation_history)} messages from thread {thread.id}")
 
             # STEP 1: Fetch sources FIRST
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Searching for new information...'})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'status', 'message': 'Searching for new information...'})
 
             sources = []
             sources_dict = []
             total_reviewed = 0  # Initialize to handle API failures gracefully
 
-            if not is_conversational_query(body.query):
-                # Use enhanced query for better search
-                search_query = query_analysis['enhanced_query']
-
-                # Apply filter modifications to query
-                if 'q_append' in filter_params:
-                    search_query = filter_manager.apply_filters_to_query(search_query, filter_params)
-
-                # Fetch sources before generating response with filters
-                # Google API free tier allows max 10 results per query
-                raw_sources = fetch_google_custom_search(
-                    search_query,
-                    num_results=10,
-                    date_filter=filter_params.get('dateRestrict'),
-                    file_type=filter_params.get('fileType')
-                )
+            if cse_task is not None:
+                # Sources must arrive before generating the grounded response
+                raw_sources = await cse_task
 
                 if raw_sources and len(raw_sources) > 0:
                     logger.info(f" Fetched {len(raw_sources)} raw sources for follow-up")
 
-                    # Convert to dicts for processing
-                    raw_sources_dict = []
-                    for source in raw_sources:
-                        if hasattr(source, 'model_dump'):
-                            raw_sources_dict.append(source.model_dump())
-                        else:
-                            raw_sources_dict.append({
-                                'title': source.title,
-                                'url': source.url,
-                                'snippet': source.snippet,
-                                'image': source.image if hasattr(source, 'image') else None,
-                                'favicon': source.favicon if hasattr(source, 'favicon') else None,
-                                'displayUrl': source.displayUrl if hasattr(source, 'displayUrl') else None,
-                                'publishDate': source.publishDate if hasattr(source, 'publishDate') else None,
-                            })
-
                     # Apply RAG pipeline
-                    deduped_sources = rag_pipeline.deduplicate_sources(raw_sources_dict)
-                    ranked_sources, total_reviewed = rag_pipeline.process_sources(
-                        deduped_sources,
+                    filtered_sources, total_reviewed = rag_pipeline.ingest(
+                        raw_sources,
                         body.query,
-                        max_sources=10
+                        max_sources=10,
+                        min_score=0.2
                     )
-                    filtered_sources = rag_pipeline.filter_low_quality_sources(ranked_sources, min_score=0.2)
 
                     sources_dict = filtered_sources
-                    sources = [Source(**src) for src in sources_dict]
+                    sources = [Source.model_construct(**src) for src in sources_dict]
 
                     logger.info(f" Ranked and filtered to {len(sources)} high-quality sources")
 
-                yield f"data: {json.dumps({'type': 'status', 'message': f'Reviewed {total_reviewed} sources, selected {len(sources)} best'})}\n\n"
-                await asyncio.sleep(0.01)
+                yield sse_event({'type': 'status', 'message': f'Reviewed {total_reviewed} sources, selected {len(sources)} best'})
 
             # Apply focus mode to sources if not default web mode
             if body.mode != 'web' and sources_dict:
                 logger.info(f"🎯 Applying {body.mode} focus mode to follow-up sources")
                 sources_dict = focus_manager._filter_sources_by_mode(sources_dict, focus_mode)
-                sources = [Source(**src) for src in sources_dict]
+                sources = [Source.model_construct(**src) for src in sources_dict]
                 logger.info(f" Focus mode applied, {len(sources_dict)} sources after filtering")
 
             # STEP 2: Build grounded prompt with conversation context
@@ -1482,18 +1760,10 @@ async def follow_up_stream(
             else:
                 formatted_query = base_prompt
 
-            # Configure Gemini (without grounding tool)
-            config = types.GenerateContentConfig(
-                temperature=GEMINI_TEMPERATURE,
-                top_p=GEMINI_TOP_P,
-                top_k=GEMINI_TOP_K,
-                max_output_tokens=GEMINI_MAX_OUTPUT_TOKENS,
-            )
-
             # Create chat with history
-            chat = client.chats.create(
+            chat = client.aio.chats.create(
                 model=GEMINI_MODEL,
-                config=config,
+                config=GEMINI_CONFIG,
                 history=conversation_history
             )
 
@@ -1503,26 +1773,26 @@ async def follow_up_stream(
 
             logger.info(f"🔄 Starting follow-up streaming for session: {body.sessionId}")
 
-            for chunk in chat.send_message_stream(formatted_query):
-                if hasattr(chunk, 'text') and chunk.text:
-                    full_text += chunk.text
-                    formatted_chunk = markdown_buffer.process_chunk(chunk.text)
+            async for chunk in await chat.send_message_stream(formatted_query):
+                # .text is a computed property on the SDK response; read it once per chunk
+                chunk_text = getattr(chunk, 'text', None)
+                if chunk_text:
+                    full_text += chunk_text
+                    formatted_chunk = markdown_buffer.process_chunk(chunk_text)
                     if formatted_chunk:
-                        yield f"data: {json.dumps({'type': 'token', 'content': formatted_chunk})}\n\n"
-                    await asyncio.sleep(0.01)
+                        yield sse_event({'type': 'token', 'content': formatted_chunk})
 
                 # Keep last chunk for metadata
                 full_response = chunk
 
             remaining = markdown_buffer.flush()
             if remaining:
-                yield f"data: {json.dumps({'type': 'token', 'content': remaining})}\n\n"
+                yield sse_event({'type': 'token', 'content': remaining})
 
             logger.info(f" Follow-up streaming complete. Total length: {len(full_text)}")
 
             # STEP 4: Validate grounding and inject citations
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Processing citations...'})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'status', 'message': 'Processing citations...'})
 
             # Format initial text to markdown/HTML
             formatted_text_no_citations = format_response_to_markdown(full_text)
@@ -1550,12 +1820,23 @@ async def follow_up_stream(
                 )
 
                 # Display all sources searched (not just cited ones) for transparency
-                sources = [Source(**src) for src in all_sources]
+                sources = [Source.model_construct(**src) for src in all_sources]
                 logger.info(f" Processed {len(all_sources)} sources with citations")
             else:
                 formatted_text = formatted_text_no_citations
                 logger.info("💬 No sources to cite (conversational query)")
 
+            # Serialize sources once for both the database row and the SSE frame
+            sources_payload = [s.model_dump() for s in sources]
+
+            # Generate related questions in the background while the response is persisted
+            # (greetings and small talk don't need follow-up suggestions)
+            related_task = None
+            if not is_conversational:
+                related_task = asyncio.create_task(asyncio.to_thread(
+                    generate_related_questions, body.query, formatted_text
+                ))
+
             # Save to database if threadId provided
             if body.threadId:
                 thread = db.query(Thread).filter(Thread.id == body.threadId).first()
@@ -1573,42 +1854,46 @@ async def follow_up_stream(
                             thread_id=thread.id,
                             role='assistant',
                             content=formatted_text,
-                            sources=[s.model_dump() for s in sources] if sources else []
+                            sources=sources_payload
                         )
                         db.add(assistant_message)
 
                         thread.updated_at = datetime.now(timezone.utc)
                         db.commit()
                         logger.info(f" Saved follow-up to thread {thread.id}")
+                        await invalidate_thread_caches(user_identifier, thread.share_id)
                     except Exception as e:
                         db.rollback()
                         logger.error(f" Failed to save follow-up messages to database: {e}")
                         # Continue execution - the response already completed, just logging failed
 
             # Send sources
-            yield f"data: {json.dumps({'type': 'sources', 'sources': [s.model_dump() for s in sources]})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'sources', 'sources': sources_payload})
 
-            # Generate related questions
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Generating suggestions...'})}\n\n"
-            related_questions = generate_related_questions(body.query, formatted_text)
-            yield f"data: {json.dumps({'type': 'related_questions', 'questions': related_questions})}\n\n"
-            await asyncio.sleep(0.01)
+            # Send related questions
+            if related_task is not None:
+                yield sse_event({'type': 'status', 'message': 'Generating suggestions...'})
+                yield sse_event({'type': 'related_questions', 'questions': await related_task})
+            else:
+                yield _SSE_EMPTY_RELATED
 
             # Track search for free tier users
             if not is_browser_user:
-                track_search(user_identifier, db)
+                await track_search(user_identifier, db)
                 logger.info(f"📊 Free tier follow-up tracked for {user_identifier}")
 
             # Send completion
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield _SSE_DONE
             logger.info(f" Follow-up streaming session {body.sessionId} completed")
 
         except Exception as e:
             logger.error(f" Follow-up streaming error: {e}")
-            import traceback
             traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'message': str(e)})
+        finally:
+            # Don't leave a search running (and billed) if we bailed out before awaiting it
+            if cse_task is not None and not cse_task.done():
+                cse_task.cancel()
 
     return StreamingResponse(
         generate(),
@@ -1639,9 +1924,9 @@ async def search_multimodal_stream(
 
         # Free tier: check rate limit
         if not is_browser_user:
-            if check_rate_limit(user_identifier, db):
+            if await check_rate_limit(user_identifier, db):
                 error_msg = f"Daily search limit ({FREE_TIER_DAILY_LIMIT} searches) exceeded. Please try again tomorrow."
-                yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
+                yield sse_event({'type': 'error', 'message': error_msg})
                 return
 
         logger.info(f"🔐 Multimodal from: {'Browser Pro' if is_browser_user else 'Free tier'} | ID: {user_identifier}")
@@ -1656,26 +1941,32 @@ async def search_multimodal_stream(
             # Sanitize filename to prevent directory traversal attacks
             safe_filename = FileValidator.sanitize_filename(file.filename or "upload")
 
+            # Start base64 encoding in a worker thread so it overlaps validation and thread creation
+            encode_task = asyncio.create_task(
+                asyncio.to_thread(lambda: base64.b64encode(file_contents).decode('utf-8'))
+            )
+
             # Comprehensive file validation using FileValidator
             validator = FileValidator()
-            is_valid, error_message = validator.validate_file(
+            is_valid, error_message = await asyncio.to_thread(
+                validator.validate_file,
                 file_contents,
                 safe_filename,
                 file.content_type
             )
 
             if not is_valid:
+                encode_task.cancel()
                 log_file_upload(safe_filename, file_size, file.content_type, False)
                 log_error("File validation failed", error_message, {"filename": safe_filename})
-                yield f"data: {json.dumps({'type': 'error', 'message': error_message})}\n\n"
+                yield sse_event({'type': 'error', 'message': error_message})
                 return
 
             log_file_upload(safe_filename, file_size, file.content_type, True)
 
             # Generate session and thread IDs
             session_id = generate_session_id()
-            yield f"data: {json.dumps({'type': 'session_id', 'sessionId': session_id})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'session_id', 'sessionId': session_id})
 
             # Create new thread (use sanitized filename)
             thread_title = f"{safe_filename}: {q[:50]}..." if len(q) > 50 else f"{safe_filename}: {q}"
@@ -1687,15 +1978,13 @@ async def search_multimodal_stream(
             )
             db.add(new_thread)
             db.flush()
-            yield f"data: {json.dumps({'type': 'thread_id', 'threadId': new_thread.id})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'thread_id', 'threadId': new_thread.id})
 
             # Send status: Processing file (use sanitized filename)
-            yield f"data: {json.dumps({'type': 'status', 'message': f'Processing {safe_filename}...'})}\n\n"
-            await asyncio.sleep(0.01)
+            yield sse_event({'type': 'status', 'message': f'Processing {safe_filename}...'})
 
-            # Encode file to base64
-            file_data = base64.b64encode(file_contents).decode('utf-8')
+            # Collect the base64 payload (usually finished by now)
+            file_data = await encode_task
 
             # Prepare multimodal content for Gemini
             if file.content_type == 'application/pdf':
@@ -1721,86 +2010,81 @@ async def search_multimodal_stream(
                     }
                 ]
 
-            # Configure Gemini
-            config = types.GenerateContentConfig(
-                temperature=GEMINI_TEMPERATURE,
-                top_p=GEMINI_TOP_P,
-                top_k=GEMINI_TOP_K,
-                max_output_tokens=GEMINI_MAX_OUTPUT_TOKENS,
-            )
-
             # Stream the response
             full_text = ""
             markdown_buffer = StreamingMarkdownBuffer()
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Analyzing content...'})}\n\n"
+            yield sse_event({'type': 'status', 'message': 'Analyzing content...'})
 
             logger.info(f"🔄 Starting multimodal streaming for: {safe_filename}")
 
-            for chunk in client.models.generate_content_stream(
+            async for chunk in await client.aio.models.generate_content_stream(
                 model=GEMINI_MODEL,
                 contents={"parts": parts},
-                config=config
+                config=GEMINI_CONFIG
             ):
-                if hasattr(chunk, 'text') and chunk.text:
-                    full_text += chunk.text
-                    formatted_chunk = markdown_buffer.process_chunk(chunk.text)
+                # .text is a computed property on the SDK response; read it once per chunk
+                chunk_text = getattr(chunk, 'text', None)
+                if chunk_text:
+                    full_text += chunk_text
+                    formatted_chunk = markdown_buffer.process_chunk(chunk_text)
                     if formatted_chunk:
-                        yield f"data: {json.dumps({'type': 'token', 'content': formatted_chunk})}\n\n"
-                    await asyncio.sleep(0.01)
+                        yield sse_event({'type': 'token', 'content': formatted_chunk})
 
             remaining = markdown_buffer.flush()
             if remaining:
-                yield f"data: {json.dumps({'type': 'token', 'content': remaining})}\n\n"
+                yield sse_event({'type': 'token', 'content': remaining})
 
             logger.info(f" Multimodal streaming complete. Total length: {len(full_text)}")
 
             # Format text
             formatted_text = format_response_to_markdown(full_text)
 
-            # Save to database (use sanitized filename)
-            try:
-                user_message = Message(
+            # Stage both messages in one batch (committed before the done event)
+            db.add_all([
+                Message(
                     thread_id=new_thread.id,
                     role='user',
                     content=f"[Uploaded {safe_filename}] {q}",
                     sources=None
-                )
-                db.add(user_message)
-
-                assistant_message = Message(
+                ),
+                Message(
                     thread_id=new_thread.id,
                     role='assistant',
                     content=formatted_text,
                     sources=[]
                 )
-                db.add(assistant_message)
+            ])
+
+            # Save to database (use sanitized filename)
+            try:
                 db.commit()
                 log_database_operation("INSERT", "messages", new_thread.id)
                 logger.info(f" Saved multimodal messages to thread {new_thread.id}")
+                await invalidate_thread_caches(user_identifier)
             except Exception as e:
                 db.rollback()
                 logger.error(f" Failed to save multimodal messages to database: {e}")
                 # Continue execution - the response already completed, just logging failed
 
             # No sources for multimodal (file is the source)
-            yield f"data: {json.dumps({'type': 'sources', 'sources': []})}\n\n"
+            yield _SSE_EMPTY_SOURCES
 
             # No related questions for now
-            yield f"data: {json.dumps({'type': 'related_questions', 'questions': []})}\n\n"
+            yield _SSE_EMPTY_RELATED
 
             # Track search for free tier users
             if not is_browser_user:
-                track_search(user_identifier, db)
+                await track_search(user_identifier, db)
                 logger.info(f"📊 Free tier multimodal search tracked for {user_identifier}")
 
             # Send completion
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield _SSE_DONE
             logger.info(f" Multimodal session {session_id} completed")
 
         except Exception as e:
             logger.exception(f" Multimodal streaming error: {e}")
             log_error("Multimodal streaming error", str(e), {"session_id": session_id})
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'message': str(e)})
 
     return StreamingResponse(
         generate(),
@@ -1815,25 +2099,91 @@ async def search_multimodal_stream(
 
 # Thread management endpoints
 
+# Read-through Redis cache for thread lists and public shared threads.
+# The list TTL is short because ordering changes whenever any thread is touched.
+THREAD_LIST_CACHE_TTL = int(os.getenv("THREAD_LIST_CACHE_TTL", "10"))
+SHARED_THREAD_CACHE_TTL = int(os.getenv("SHARED_THREAD_CACHE_TTL", "300"))
+
+
+def _thread_list_key(user_identifier: str) -> str:
+    """Redis hash holding a user's cached thread lists, one field per page (limit + cursor)"""
+    return f"threads:{user_identifier}"
+
+
+def _shared_thread_key(share_id: str) -> str:
+    return f"shared:{share_id}"
+
+
+async def invalidate_thread_caches(user_identifier: str, share_id: Optional[str] = None):
+    """Drop cached thread lists for a user (and the shared view of a thread, if any)"""
+    if redis_client is None:
+        return
+    keys = [_thread_list_key(user_identifier)]
+    if share_id:
+        keys.append(_shared_thread_key(share_id))
+    try:
+        await redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.error(f" Failed to invalidate thread caches: {e}")
+
+
 @app.get("/api/threads", response_model=List[ThreadListResponse])
 async def list_threads(
     request: Request,
     browser_auth: Optional[str] = Header(None, alias="X-Browser-Auth"),
     user_id: Optional[str] = Header(None, alias="X-User-ID"),
     db: Session = Depends(get_db),
-    limit: int = 50
+    limit: int = 50,
+    before: Optional[datetime] = Query(None, description="Keyset cursor: the last item's updated_at"),
+    before_id: Optional[str] = Query(None, description="Keyset cursor tie-breaker: the last item's id")
 ):
     """Get list of all threads for the current user, ordered by most recent"""
     user_identifier, is_browser_user = get_user_identifier(request, browser_auth, user_id)
+    if before is not None and before.tzinfo is not None:
+        # updated_at is stored as naive UTC
+        before = before.astimezone(timezone.utc).replace(tzinfo=None)
 
-    threads = db.query(Thread).filter(
+    cache_key = _thread_list_key(user_identifier)
+    cache_field = f"{limit}:{before.isoformat() if before else ''}:{before_id or ''}"
+
+    if redis_client is not None:
+        try:
+            cached_body = await redis_client.hget(cache_key, cache_field)
+            if cached_body:
+                return Response(content=cached_body, media_type="application/json")
+        except redis.RedisError as e:
+            logger.error(f" Redis thread list lookup failed: {e}")
+
+    # Count messages in SQL alongside each thread instead of loading them
+    query = db.query(Thread, func.count(Message.id)).outerjoin(Message).filter(
         Thread.user_id == user_identifier
-    ).order_by(Thread.updated_at.desc()).limit(limit).all()
+    )
+    if before is not None:
+        # Seek past the previous page via the (user_id, updated_at) index instead of OFFSET;
+        # (updated_at, id) so threads sharing an updated_at across a page boundary aren't skipped
+        if before_id is not None:
+            query = query.filter(tuple_(Thread.updated_at, Thread.id) < (before, before_id))
+        else:
+            query = query.filter(Thread.updated_at < before)
+    rows = query.group_by(Thread.id).order_by(
+        Thread.updated_at.desc(), Thread.id.desc()
+    ).limit(limit).all()
+
+    body = orjson.dumps([thread.to_dict(message_count) for thread, message_count in rows])
 
-    return [thread.to_dict() for thread in threads]
+    if redis_client is not None:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(cache_key, cache_field, body)
+                pipe.expire(cache_key, THREAD_LIST_CACHE_TTL)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f" Failed to cache thread list: {e}")
+
+    return Response(content=body, media_type="application/json")
 
 
-@app.get("/api/threads/{thread_id}", response_model=ThreadDetailResponse)
+@app.get("/api/threads/{thread_id}", response_model=ThreadDetailResponse, response_class=ORJSONResponse)
 async def get_thread(
     thread_id: str,
     request: Request,
@@ -1844,7 +2194,8 @@ async def get_thread(
     """Get a specific thread with all its messages"""
     user_identifier, is_browser_user = get_user_identifier(request, browser_auth, user_id)
 
-    thread = db.query(Thread).filter(
+    # Load the thread and its (created_at-ordered) messages in one round trip
+    thread = db.query(Thread).options(joinedload(Thread.messages)).filter(
         Thread.id == thread_id,
         Thread.user_id == user_identifier
     ).first()
@@ -1855,17 +2206,16 @@ async def get_thread(
             detail=f"Thread '{thread_id}' not found. It may have been deleted."
         )
 
-    messages = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.created_at.asc()).all()
-
-    return ThreadDetailResponse(
-        id=thread.id,
-        title=thread.title,
-        session_id=thread.session_id,
-        created_at=thread.created_at.isoformat(),
-        updated_at=thread.updated_at.isoformat(),
-        is_pinned=thread.is_pinned,
-        messages=[msg.to_dict() for msg in messages]
-    )
+    # Already in ThreadDetailResponse shape; return it directly to skip model validation
+    return ORJSONResponse({
+        "id": thread.id,
+        "title": thread.title,
+        "session_id": thread.session_id,
+        "created_at": thread.created_at.isoformat(),
+        "updated_at": thread.updated_at.isoformat(),
+        "is_pinned": thread.is_pinned,
+        "messages": [msg.to_dict() for msg in thread.messages]
+    })
 
 
 @app.patch("/api/threads/{thread_id}")
@@ -1896,6 +2246,9 @@ async def update_thread(
 
         thread.updated_at = datetime.now(timezone.utc)
         db.commit()
+        # Sessions don't expire on commit; reload so timestamps serialize as stored (naive UTC)
+        db.refresh(thread)
+        await invalidate_thread_caches(user_identifier, thread.share_id)
 
         return {"success": True, "thread": thread.to_dict()}
     except Exception as e:
@@ -1915,7 +2268,8 @@ async def delete_thread(
     """Delete a thread and all its messages"""
     user_identifier, is_browser_user = get_user_identifier(request, browser_auth, user_id)
 
-    thread = db.query(Thread).filter(
+    # Ownership check; only the share_id is needed afterwards (for cache invalidation)
+    thread = db.query(Thread.share_id).filter(
         Thread.id == thread_id,
         Thread.user_id == user_identifier
     ).first()
@@ -1924,8 +2278,12 @@ async def delete_thread(
         raise HTTPException(status_code=404, detail="Thread not found")
 
     try:
-        db.delete(thread)
+        # Bulk DELETEs instead of loading every message for the ORM cascade.
+        # Messages are removed explicitly because SQLite doesn't enforce ON DELETE CASCADE by default.
+        db.query(Message).filter(Message.thread_id == thread_id).delete(synchronize_session=False)
+        db.query(Thread).filter(Thread.id == thread_id).delete(synchronize_session=False)
         db.commit()
+        await invalidate_thread_caches(user_identifier, thread.share_id)
 
         return {"success": True, "message": "Thread deleted"}
     except Exception as e:
@@ -1956,7 +2314,7 @@ async def create_share_link(
     try:
         # Generate share ID if not already exists
         if not thread.share_id:
-            thread.share_id = ''.join(random.choices(string.ascii_lowercase + string.digits, k=12))
+            thread.share_id = generate_share_id()
             db.commit()
 
         return {"shareId": thread.share_id, "threadId": thread.id}
@@ -1969,21 +2327,37 @@ async def create_share_link(
 @app.get("/api/shared/{share_id}")
 async def get_shared_thread(share_id: str, db: Session = Depends(get_db)):
     """Get a thread by its share ID (public access)"""
-    thread = db.query(Thread).filter(Thread.share_id == share_id).first()
+    cache_key = _shared_thread_key(share_id)
+
+    if redis_client is not None:
+        try:
+            cached_body = await redis_client.get(cache_key)
+            if cached_body:
+                return Response(content=cached_body, media_type="application/json")
+        except redis.RedisError as e:
+            logger.error(f" Redis shared thread lookup failed: {e}")
+
+    thread = db.query(Thread).options(joinedload(Thread.messages)).filter(Thread.share_id == share_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Shared conversation not found")
 
-    messages = db.query(Message).filter(Message.thread_id == thread.id).order_by(Message.created_at.asc()).all()
+    body = orjson.dumps({
+        "id": thread.id,
+        "title": thread.title,
+        "session_id": thread.session_id,
+        "created_at": thread.created_at.isoformat(),
+        "updated_at": thread.updated_at.isoformat(),
+        "is_pinned": thread.is_pinned,
+        "messages": [msg.to_dict() for msg in thread.messages]
+    })
+
+    if redis_client is not None:
+        try:
+            await redis_client.set(cache_key, body, ex=SHARED_THREAD_CACHE_TTL)
+        except redis.RedisError as e:
+            logger.error(f" Failed to cache shared thread: {e}")
 
-    return ThreadDetailResponse(
-        id=thread.id,
-        title=thread.title,
-        session_id=thread.session_id,
-        created_at=thread.created_at.isoformat(),
-        updated_at=thread.updated_at.isoformat(),
-        is_pinned=thread.is_pinned,
-        messages=[msg.to_dict() for msg in messages]
-    )
+    return Response(content=body, media_type="application/json")
 
 
 # Admin endpoints (require ADMIN_API_KEY)
@@ -1997,59 +2371,66 @@ def verify_admin_key(admin_key: str = Header(None, alias="X-Admin-Key")):
     return True
 
 
-@app.get("/api/admin/users")
-async def get_all_users(
-    db: Session = Depends(get_db),
-    admin_verified: bool = Depends(verify_admin_key)
-):
-    """Get list of all users (browser users and free tier IPs) with stats"""
-    from sqlalchemy import func
+# Admin dashboards poll; a few seconds of staleness is fine and keeps the
+# aggregation queries off the database on every refresh.
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", "5"))
+ADMIN_CACHE_MAX_ENTRIES = 1000
+
+_admin_cache: Dict[tuple, tuple] = {}  # {key: (expires_at, value)}
+
+
+async def cached(ttl: float, key: tuple, producer):
+    """Return a cached value for key, calling producer() when missing or expired"""
+    now = time.monotonic()
+    entry = _admin_cache.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    value = producer()
 
-    # Get all unique users from threads with their stats
+    if len(_admin_cache) >= ADMIN_CACHE_MAX_ENTRIES:
+        # Drop expired entries; clear everything if that didn't free room
+        for stale_key in [k for k, (expires_at, _) in _admin_cache.items() if expires_at <= now]:
+            del _admin_cache[stale_key]
+        if len(_admin_cache) >= ADMIN_CACHE_MAX_ENTRIES:
+            _admin_cache.clear()
+
+    _admin_cache[key] = (now + ttl, value)
+    return value
+
+
+def _compute_all_users(db: Session, limit: int, offset: int) -> dict:
+    # Get unique users from threads with their stats (paginated, most recent first)
+    last_activity_col = func.max(Thread.updated_at).label('last_activity')
     user_stats = db.query(
         Thread.user_id,
         Thread.is_browser_user,
         func.count(Thread.id).label('thread_count'),
-        func.max(Thread.updated_at).label('last_activity')
-    ).group_by(Thread.user_id, Thread.is_browser_user).all()
-
-    users = []
-    for user_id, is_browser, thread_count, last_activity in user_stats:
-        user_type = "Browser Pro" if is_browser else "Free Tier"
-        users.append({
-            "user_id": user_id,
-            "user_type": user_type,
+        last_activity_col
+    ).group_by(
+        Thread.user_id, Thread.is_browser_user
+    ).order_by(
+        last_activity_col.desc(), Thread.user_id
+    ).limit(limit).offset(offset).all()
+
+    users = [
+        {
+            "user_id": uid,
+            "user_type": "Browser Pro" if is_browser else "Free Tier",
             "thread_count": thread_count,
             "last_activity": last_activity.isoformat() if last_activity else None
-        })
+        }
+        for uid, is_browser, thread_count, last_activity in user_stats
+    ]
 
-    return {"users": users, "total": len(users)}
+    # Total number of users (user_id / user type groups), not just this page
+    total = db.query(Thread.user_id, Thread.is_browser_user).distinct().count()
 
+    return {"users": users, "total": total, "limit": limit, "offset": offset}
 
-@app.get("/api/admin/rate-limits")
-async def get_rate_limits(
-    db: Session = Depends(get_db),
-    admin_verified: bool = Depends(verify_admin_key),
-    date: Optional[str] = None
-):
-    """Get rate limit stats for free tier users"""
-    from datetime import date as date_type
-
-    query = db.query(RateLimit)
-
-    if date:
-        # Filter by specific date (format: YYYY-MM-DD)
-        try:
-            filter_date = date_type.fromisoformat(date)
-            query = query.filter(RateLimit.date == filter_date)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-    else:
-        # Default to today
-        today = datetime.now(timezone.utc).date()
-        query = query.filter(RateLimit.date == today)
 
-    rate_limits = query.all()
+def _compute_rate_limits(db: Session, filter_date, date_label: str) -> dict:
+    rate_limits = db.query(RateLimit).filter(RateLimit.date == filter_date).all()
 
     return {
         "rate_limits": [
@@ -2062,34 +2443,35 @@ async def get_rate_limits(
             for rl in rate_limits
         ],
         "total": len(rate_limits),
-        "date_filter": date if date else "today"
+        "date_filter": date_label
     }
 
 
-@app.get("/api/admin/user/{user_id}")
-async def get_user_details(
-    user_id: str,
-    db: Session = Depends(get_db),
-    admin_verified: bool = Depends(verify_admin_key)
-):
-    """Get detailed stats for a specific user"""
-    from sqlalchemy import func
+def _compute_user_details(db: Session, user_id: str) -> dict:
+    # Aggregate thread stats in a single query
+    thread_count, first_activity, last_activity = db.query(
+        func.count(Thread.id),
+        func.min(Thread.created_at),
+        func.max(Thread.updated_at)
+    ).filter(Thread.user_id == user_id).one()
 
-    # Get user's threads
-    threads = db.query(Thread).filter(Thread.user_id == user_id).order_by(Thread.updated_at.desc()).all()
-
-    if not threads:
+    if not thread_count:
         raise HTTPException(status_code=404, detail="User not found")
 
+    # Only load the threads we actually return
+    recent_threads = db.query(Thread).filter(
+        Thread.user_id == user_id
+    ).order_by(Thread.updated_at.desc()).limit(10).all()
+    is_browser_user = recent_threads[0].is_browser_user
+
     # Get message count for this user
-    thread_ids = [t.id for t in threads]
-    message_count = db.query(func.count(Message.id)).filter(
-        Message.thread_id.in_(thread_ids)
-    ).scalar()
+    message_count = db.query(func.count(Message.id)).join(
+        Thread, Message.thread_id == Thread.id
+    ).filter(Thread.user_id == user_id).scalar()
 
     # Get rate limit info if free tier
     rate_limit_info = None
-    if threads and not threads[0].is_browser_user:
+    if not is_browser_user:
         today = datetime.now(timezone.utc).date()
         rate_limit = db.query(RateLimit).filter(
             RateLimit.ip_address == user_id,
@@ -2104,11 +2486,11 @@ async def get_user_details(
 
     return {
         "user_id": user_id,
-        "user_type": "Browser Pro" if threads[0].is_browser_user else "Free Tier",
-        "thread_count": len(threads),
+        "user_type": "Browser Pro" if is_browser_user else "Free Tier",
+        "thread_count": thread_count,
         "message_count": message_count,
-        "first_activity": min(t.created_at for t in threads).isoformat(),
-        "last_activity": max(t.updated_at for t in threads).isoformat(),
+        "first_activity": first_activity.isoformat(),
+        "last_activity": last_activity.isoformat(),
         "rate_limit": rate_limit_info,
         "recent_threads": [
             {
@@ -2117,11 +2499,65 @@ async def get_user_details(
                 "created_at": t.created_at.isoformat(),
                 "updated_at": t.updated_at.isoformat()
             }
-            for t in threads[:10]  # Last 10 threads
+            for t in recent_threads  # Last 10 threads
         ]
     }
 
 
+@app.get("/api/admin/users")
+async def get_all_users(
+    db: Session = Depends(get_db),
+    admin_verified: bool = Depends(verify_admin_key),
+    limit: int = Query(500, ge=1, le=5000),
+    offset: int = Query(0, ge=0)
+):
+    """Get list of all users (browser users and free tier IPs) with stats"""
+    return await cached(
+        ADMIN_CACHE_TTL,
+        ('all_users', limit, offset),
+        lambda: _compute_all_users(db, limit, offset)
+    )
+
+
+@app.get("/api/admin/rate-limits")
+async def get_rate_limits(
+    db: Session = Depends(get_db),
+    admin_verified: bool = Depends(verify_admin_key),
+    date: Optional[str] = None
+):
+    """Get rate limit stats for free tier users"""
+    if date:
+        # Filter by specific date (format: YYYY-MM-DD)
+        try:
+            filter_date = date_type.fromisoformat(date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    else:
+        # Default to today
+        filter_date = datetime.now(timezone.utc).date()
+
+    date_label = date if date else "today"
+    return await cached(
+        ADMIN_CACHE_TTL,
+        ('rate_limits', filter_date, date_label),
+        lambda: _compute_rate_limits(db, filter_date, date_label)
+    )
+
+
+@app.get("/api/admin/user/{user_id}")
+async def get_user_details(
+    user_id: str,
+    db: Session = Depends(get_db),
+    admin_verified: bool = Depends(verify_admin_key)
+):
+    """Get detailed stats for a specific user"""
+    return await cached(
+        ADMIN_CACHE_TTL,
+        ('user_details', user_id),
+        lambda: _compute_user_details(db, user_id)
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
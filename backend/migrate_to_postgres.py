@@ -3,7 +3,8 @@
 Migration script to copy data from SQLite to PostgreSQL
 """
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
 from models import Thread, Message, Base
 from dotenv import load_dotenv
@@ -20,6 +21,29 @@ if not POSTGRES_URL or "sqlite" in POSTGRES_URL:
     print(" Please set DATABASE_URL to your PostgreSQL connection string in .env")
     exit(1)
 
+# Rows read from SQLite and inserted into PostgreSQL per round trip / commit
+BATCH_SIZE = 1000
+
+THREAD_COLUMNS = ['id', 'title', 'session_id', 'created_at', 'updated_at', 'user_id', 'is_pinned', 'share_id']
+MESSAGE_COLUMNS = ['id', 'thread_id', 'role', 'content', 'sources', 'created_at']
+
+
+def copy_table(source_session, target_session, table, columns):
+    """Stream rows from source in batches and bulk insert them, skipping ids that already exist"""
+    rows = source_session.execute(
+        select(*[table.c[name] for name in columns]).execution_options(yield_per=BATCH_SIZE)
+    ).mappings()
+    insert_stmt = pg_insert(table).on_conflict_do_nothing(index_elements=['id'])
+
+    copied = 0
+    for batch in rows.partitions():
+        target_session.execute(insert_stmt, [dict(row) for row in batch])
+        target_session.commit()
+        copied += len(batch)
+        print(f"   ... {copied} rows")
+    return copied
+
+
 def migrate():
     print("🔄 Starting migration from SQLite to PostgreSQL...")
 
@@ -28,8 +52,11 @@ def migrate():
     SqliteSession = sessionmaker(bind=sqlite_engine)
     sqlite_session = SqliteSession()
 
-    # Connect to PostgreSQL (target)
-    postgres_engine = create_engine(POSTGRES_URL)
+    # Connect to PostgreSQL (target); executemany_mode is a psycopg2-only option
+    batch_options = {"insertmanyvalues_page_size": BATCH_SIZE}
+    if make_url(POSTGRES_URL).get_driver_name() == "psycopg2":
+        batch_options.update(executemany_mode="values_plus_batch", executemany_batch_page_size=500)
+    postgres_engine = create_engine(POSTGRES_URL, **batch_options)
     PostgresSession = sessionmaker(bind=postgres_engine)
     postgres_session = PostgresSession()
 
@@ -39,50 +66,18 @@ def migrate():
         Base.metadata.create_all(bind=postgres_engine)
 
         # Migrate Threads
-        threads = sqlite_session.query(Thread).all()
-        print(f"📦 Migrating {len(threads)} threads...")
-
-        for thread in threads:
-            # Check if thread already exists
-            exists = postgres_session.query(Thread).filter_by(id=thread.id).first()
-            if not exists:
-                postgres_session.add(Thread(
-                    id=thread.id,
-                    title=thread.title,
-                    session_id=thread.session_id,
-                    created_at=thread.created_at,
-                    updated_at=thread.updated_at,
-                    user_id=thread.user_id,
-                    is_pinned=thread.is_pinned,
-                    share_id=thread.share_id
-                ))
-
-        postgres_session.commit()
+        print("📦 Migrating threads...")
+        thread_count = copy_table(sqlite_session, postgres_session, Thread.__table__, THREAD_COLUMNS)
         print(" Threads migrated")
 
-        # Migrate Messages
-        messages = sqlite_session.query(Message).all()
-        print(f"💬 Migrating {len(messages)} messages...")
-
-        for msg in messages:
-            # Check if message already exists
-            exists = postgres_session.query(Message).filter_by(id=msg.id).first()
-            if not exists:
-                postgres_session.add(Message(
-                    id=msg.id,
-                    thread_id=msg.thread_id,
-                    role=msg.role,
-                    content=msg.content,
-                    sources=msg.sources,
-                    created_at=msg.created_at
-                ))
-
-        postgres_session.commit()
+        # Migrate Messages (after threads, for the foreign key)
+        print("💬 Migrating messages...")
+        message_count = copy_table(sqlite_session, postgres_session, Message.__table__, MESSAGE_COLUMNS)
         print(" Messages migrated")
 
         print("\n🎉 Migration completed successfully!")
-        print(f"   Threads: {len(threads)}")
-        print(f"   Messages: {len(messages)}")
+        print(f"   Threads: {thread_count}")
+        print(f"   Messages: {message_count}")
 
     except Exception as e:
         print(f" Migration failed: {e}")
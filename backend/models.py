@@ -1,4 +1,5 @@
 from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey, Boolean, Enum as SQLEnum, Integer, Date, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone, date
 import uuid
@@ -23,8 +24,8 @@ class Thread(Base):
     is_pinned = Column(Boolean, default=False)
     share_id = Column(String(12), unique=True, nullable=True)  # For public sharing
 
-    # Relationship to messages
-    messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan")
+    # Relationship to messages (chronological, so eager loads come back in display order)
+    messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan", order_by="Message.created_at")
 
     # Create index for user_id filtering
     __table_args__ = (
@@ -32,7 +33,10 @@ class Thread(Base):
         Index('idx_threads_user_updated', 'user_id', 'updated_at'),
     )
 
-    def to_dict(self):
+    def to_dict(self, message_count=None):
+        # Pass a SQL-computed message_count to avoid lazy-loading every message just to count them
+        if message_count is None:
+            message_count = len(self.messages) if self.messages else 0
         return {
             "id": self.id,
             "title": self.title,
@@ -40,7 +44,7 @@ class Thread(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "is_pinned": self.is_pinned,
-            "message_count": len(self.messages) if self.messages else 0
+            "message_count": message_count
         }
 
 class Message(Base):
@@ -50,12 +54,17 @@ class Message(Base):
     thread_id = Column(String(36), ForeignKey('threads.id', ondelete='CASCADE'), nullable=False)
     role = Column(SQLEnum('user', 'assistant', name='message_role'), nullable=False)
     content = Column(Text, nullable=False)
-    sources = Column(JSON, nullable=True)  # Array of source objects
+    sources = Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=True)  # Array of source objects (JSONB on PostgreSQL)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
 
     # Relationship to thread
     thread = relationship("Thread", back_populates="messages")
 
+    # Composite index so per-thread fetches come back already in created_at order
+    __table_args__ = (
+        Index('idx_messages_thread_created', 'thread_id', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
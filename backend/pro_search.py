@@ -3,10 +3,32 @@ Pro Search - Multi-step reasoning for complex queries
 Breaks down complex questions into sub-queries and synthesizes comprehensive answers
 """
 
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 import re
 
 
+def _phrase_alternation(phrases: List[str]) -> str:
+    """Escaped alternation, longest phrase first so it wins over its own prefixes"""
+    return '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+# Words stripped out before picking the entities of a comparison query
+_COMPARISON_WORDS_RE = re.compile(_phrase_alternation([
+    'compare', 'comparison', 'between', 'difference', 'vs', 'versus', 'and'
+]))
+
+# Question words and filler phrases stripped to leave the main topic (plus question marks)
+_TOPIC_FILLER_RE = re.compile(_phrase_alternation([
+    'what is', 'what are', 'how does', 'how do', 'why is', 'why are',
+    'when is', 'when are', 'where is', 'where are',
+    'tell me about', 'explain', 'describe',
+    'comprehensive guide to', 'detailed overview of',
+    'pros and cons of', 'advantages and disadvantages of',
+    'in-depth', 'thorough', 'detailed'
+]) + r'|\?')
+
+
 class QueryDecomposer:
     """Breaks down complex queries into simpler sub-queries"""
 
@@ -18,6 +40,21 @@ class QueryDecomposer:
             'multiple', 'several', 'various', 'different',
             'comprehensive', 'detailed', 'in-depth', 'thorough'
         ]
+        self.complex_conjunctions = [' and ', ' or ', ' as well as ', ' along with ']
+
+        # Precompiled alternations: one scan of the query instead of one substring search per phrase
+        self._complex_re = self._compile_phrases(self.complex_indicators)
+        # Lookahead so adjacent conjunctions don't consume each other's separating space
+        self._conjunction_re = re.compile(r' (and|or|as well as|along with)(?= )')
+        self._comparison_re = self._compile_phrases(['compare', 'difference', 'vs', 'versus'])
+        self._pros_cons_re = self._compile_phrases(['pros and cons', 'advantages and disadvantages'])
+        self._multi_aspect_re = self._compile_phrases(['how and why', 'what and how', 'when and where'])
+        self._comprehensive_re = self._compile_phrases(['comprehensive', 'detailed', 'in-depth', 'thorough'])
+
+    @staticmethod
+    def _compile_phrases(phrases: List[str]) -> re.Pattern:
+        """Compile literal phrases into a single substring-matching alternation"""
+        return re.compile('|'.join(re.escape(phrase) for phrase in phrases))
 
     def is_complex_query(self, query: str) -> bool:
         """
@@ -29,25 +66,25 @@ class QueryDecomposer:
         Returns:
             True if query is complex, False otherwise
         """
+        # Cheapest checks first: multiple questions, then long queries (likely complex)
+        if query.count('?') > 1 or len(query.split()) > 15:
+            return True
+
         query_lower = query.lower()
 
         # Check for complex indicators
-        has_complex_indicators = any(indicator in query_lower for indicator in self.complex_indicators)
-
-        # Check for multiple questions
-        has_multiple_questions = query.count('?') > 1
+        if self._complex_re.search(query_lower):
+            return True
 
         # Check for conjunctions that indicate multiple topics
-        complex_conjunctions = [' and ', ' or ', ' as well as ', ' along with ']
-        has_complex_conjunctions = sum(1 for conj in complex_conjunctions if conj in query_lower) >= 2
-
-        # Check for long queries (likely complex)
-        is_long = len(query.split()) > 15
+        # (at least two *different* conjunctions; stop as soon as the second one appears)
+        seen_conjunctions = set()
+        for match in self._conjunction_re.finditer(query_lower):
+            seen_conjunctions.add(match.group(1))
+            if len(seen_conjunctions) >= 2:
+                return True
 
-        return (has_complex_indicators or
-                has_multiple_questions or
-                has_complex_conjunctions or
-                is_long)
+        return False
 
     def decompose_query(self, query: str, max_sub_queries: int = 3) -> List[str]:
         """
@@ -61,9 +98,10 @@ class QueryDecomposer:
             List of sub-queries
         """
         sub_queries = []
+        query_lower = query.lower()
 
         # Handle comparison queries
-        if any(word in query.lower() for word in ['compare', 'difference', 'vs', 'versus']):
+        if self._comparison_re.search(query_lower):
             # Extract entities being compared
             entities = self._extract_comparison_entities(query)
             if len(entities) >= 2:
@@ -71,7 +109,7 @@ class QueryDecomposer:
                     sub_queries.append(f"What is {entity}? Key features and characteristics")
 
         # Handle pros/cons queries
-        elif 'pros and cons' in query.lower() or 'advantages and disadvantages' in query.lower():
+        elif self._pros_cons_re.search(query_lower):
             topic = self._extract_main_topic(query)
             sub_queries.append(f"What are the advantages and benefits of {topic}?")
             sub_queries.append(f"What are the disadvantages and drawbacks of {topic}?")
@@ -83,18 +121,18 @@ class QueryDecomposer:
             sub_queries.extend(parts[:max_sub_queries])
 
         # Handle "how and why" type queries
-        elif any(combo in query.lower() for combo in ['how and why', 'what and how', 'when and where']):
+        elif self._multi_aspect_re.search(query_lower):
             topic = self._extract_main_topic(query)
 
-            if 'how and why' in query.lower():
+            if 'how and why' in query_lower:
                 sub_queries.append(f"How does {topic} work?")
                 sub_queries.append(f"Why is {topic} important or necessary?")
-            elif 'what and how' in query.lower():
+            elif 'what and how' in query_lower:
                 sub_queries.append(f"What is {topic}?")
                 sub_queries.append(f"How does {topic} work or function?")
 
         # Handle comprehensive queries
-        elif any(word in query.lower() for word in ['comprehensive', 'detailed', 'in-depth', 'thorough']):
+        elif self._comprehensive_re.search(query_lower):
             topic = self._extract_main_topic(query)
             sub_queries.append(f"What is {topic}? Basic overview and definition")
             sub_queries.append(f"{topic}: Key features, characteristics, and details")
@@ -112,12 +150,10 @@ class QueryDecomposer:
         entities = []
 
         # Remove common comparison words
-        cleaned = query.lower()
-        for word in ['compare', 'comparison', 'between', 'difference', 'vs', 'versus', 'and']:
-            cleaned = cleaned.replace(word, ' ')
+        cleaned = _COMPARISON_WORDS_RE.sub(' ', query.lower())
 
         # Split and clean
-        parts = [p.strip() for p in cleaned.split() if len(p.strip()) > 2]
+        parts = [p for p in cleaned.split() if len(p) > 2]
 
         # Take first few meaningful parts
         if len(parts) >= 2:
@@ -128,23 +164,8 @@ class QueryDecomposer:
 
     def _extract_main_topic(self, query: str) -> str:
         """Extract the main topic from a query"""
-        # Remove question words and common phrases
-        topic = query.lower()
-
-        remove_phrases = [
-            'what is', 'what are', 'how does', 'how do', 'why is', 'why are',
-            'when is', 'when are', 'where is', 'where are',
-            'tell me about', 'explain', 'describe',
-            'comprehensive guide to', 'detailed overview of',
-            'pros and cons of', 'advantages and disadvantages of',
-            'in-depth', 'thorough', 'detailed'
-        ]
-
-        for phrase in remove_phrases:
-            topic = topic.replace(phrase, '')
-
-        # Remove question marks and extra spaces
-        topic = topic.replace('?', '').strip()
+        # Remove question words, common phrases and question marks in one pass
+        topic = _TOPIC_FILLER_RE.sub('', query.lower()).strip()
 
         # If topic is too short, return original query
         if len(topic) < 3:
@@ -153,11 +174,21 @@ class QueryDecomposer:
         return topic
 
 
+# QueryDecomposer holds only fixed patterns, so one instance can serve every engine
+_DECOMPOSER = QueryDecomposer()
+
+
+@lru_cache(maxsize=2048)
+def _decompose_cached(query: str, max_sub_queries: int) -> Tuple[str, ...]:
+    """Memoized decomposition (deterministic for a given query); tuple so cached results can't be mutated"""
+    return tuple(_DECOMPOSER.decompose_query(query, max_sub_queries=max_sub_queries))
+
+
 class ProSearchEngine:
     """Manages multi-step Pro Search execution"""
 
     def __init__(self):
-        self.decomposer = QueryDecomposer()
+        self.decomposer = _DECOMPOSER
 
     def should_use_pro_search(self, query: str, user_requested: bool = False) -> bool:
         """
@@ -187,7 +218,7 @@ class ProSearchEngine:
         Returns:
             Search strategy dictionary
         """
-        sub_queries = self.decomposer.decompose_query(query, max_sub_queries=3)
+        sub_queries = list(_decompose_cached(query, 3))
 
         strategy = {
             'original_query': query,
@@ -277,17 +308,15 @@ Remember: This is Pro Search - provide a thorough, well-sourced, comprehensive a
         Returns:
             Merged and deduplicated source list
         """
-        seen_urls = set()
-        merged = []
-
+        # Insertion-ordered dict keyed by URL; setdefault keeps the first occurrence
+        merged = {}
         for source_list in source_lists:
             for source in source_list:
-                url = source.get('url', '')
-                if url and url not in seen_urls:
-                    seen_urls.add(url)
-                    merged.append(source)
+                url = source.get('url')
+                if url:
+                    merged.setdefault(url, source)
 
-        return merged
+        return list(merged.values())
 
     def estimate_search_time(self, num_sub_queries: int) -> int:
         """
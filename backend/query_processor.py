@@ -3,49 +3,79 @@ Query Processor - Understands and expands user queries for better search results
 """
 
 import re
-from typing import List, Dict, Tuple
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
 
+# Query intent patterns (checked in order; first match wins)
+INTENT_PATTERNS = {
+    'factual': [
+        r'\b(what|who|when|where|which)\s+(is|are|was|were)\b',
+        r'\b(define|definition of|meaning of)\b',
+        r'\b(how many|how much)\b',
+    ],
+    'comparison': [
+        r'\b(difference between|compare|vs|versus)\b',
+        r'\b(better|worse|superior|inferior)\b',
+        r'\b(advantages|disadvantages|pros|cons)\b',
+    ],
+    'how_to': [
+        r'\b(how to|how do|how can)\b',
+        r'\b(steps to|guide to|tutorial)\b',
+        r'\b(learn|teach me)\b',
+    ],
+    'explanation': [
+        r'\b(why|how does|explain|describe)\b',
+        r'\b(what causes|what makes)\b',
+        r'\b(reason for|purpose of)\b',
+    ],
+    'recommendation': [
+        r'\b(best|top|recommend|suggest)\b',
+        r'\b(should I|which one|what to choose)\b',
+    ],
+    'analysis': [
+        r'\b(analyze|analysis|review|evaluate)\b',
+        r'\b(impact of|effect of|consequence)\b',
+    ],
+    'current_events': [
+        r'\b(latest|recent|news|current|today|now)\b',
+        r'\b(2024|2025)\b',  # Recent years
+    ],
+}
+
+# Time-related markers, matched as plain substrings (checked in order; first hit wins)
+TEMPORAL_MARKERS = {
+    'recent': ('recent', 'latest', 'current', 'now', 'today', 'this week', 'this month'),
+    'historical': ('history', 'historical', 'origin', 'invented', 'founded', 'created'),
+    'future': ('future', 'upcoming', 'will', 'prediction', 'forecast'),
+}
+
+# Compiled once at import, one alternation per intent so a single search decides each intent
+_INTENT_REGEXES = [
+    (intent, re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE))
+    for intent, patterns in INTENT_PATTERNS.items()
+]
+_WORD_RE = re.compile(r'\b[A-Za-z][a-z]*[A-Za-z0-9]*\b')
+_YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+
+# Common stop words dropped from extracted keywords
+_KEYWORD_STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'can', 'of', 'at', 'by', 'for', 'with',
+    'about', 'as', 'into', 'through', 'during', 'before', 'after',
+    'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on',
+    'off', 'over', 'under', 'again', 'further', 'then', 'once'
+})
+
+
 class QueryProcessor:
     """Processes and enhances user queries for better search results"""
 
     def __init__(self):
         # Query intent patterns
-        self.intent_patterns = {
-            'factual': [
-                r'\b(what|who|when|where|which)\s+(is|are|was|were)\b',
-                r'\b(define|definition of|meaning of)\b',
-                r'\b(how many|how much)\b',
-            ],
-            'comparison': [
-                r'\b(difference between|compare|vs|versus)\b',
-                r'\b(better|worse|superior|inferior)\b',
-                r'\b(advantages|disadvantages|pros|cons)\b',
-            ],
-            'how_to': [
-                r'\b(how to|how do|how can)\b',
-                r'\b(steps to|guide to|tutorial)\b',
-                r'\b(learn|teach me)\b',
-            ],
-            'explanation': [
-                r'\b(why|how does|explain|describe)\b',
-                r'\b(what causes|what makes)\b',
-                r'\b(reason for|purpose of)\b',
-            ],
-            'recommendation': [
-                r'\b(best|top|recommend|suggest)\b',
-                r'\b(should I|which one|what to choose)\b',
-            ],
-            'analysis': [
-                r'\b(analyze|analysis|review|evaluate)\b',
-                r'\b(impact of|effect of|consequence)\b',
-            ],
-            'current_events': [
-                r'\b(latest|recent|news|current|today|now)\b',
-                r'\b(2024|2025)\b',  # Recent years
-            ],
-        }
+        self.intent_patterns = INTENT_PATTERNS
 
     def process_query(self, query: str) -> Dict[str, any]:
         """
@@ -58,17 +88,33 @@ class QueryProcessor:
             'temporal_context': time-related context
         }
         """
+        # The current year feeds the expansions, so it's part of the cache key
+        cached = _process_query_cached(query, datetime.now().year)
+
+        # Fresh containers so callers can't mutate the cached entry
+        return {
+            **cached,
+            'expanded_queries': list(cached['expanded_queries']),
+            'keywords': list(cached['keywords']),
+            'temporal_context': dict(cached['temporal_context'])
+        }
+
+    def _analyze_query(self, query: str) -> Dict[str, any]:
+        """Uncached body of process_query"""
+        # Lowercase once for both intent and temporal detection
+        query_lower = query.lower()
+
         # Classify intent
-        intent = self.classify_intent(query)
+        intent = self._classify_lowered(query_lower)
 
         # Extract keywords
         keywords = self.extract_keywords(query)
 
         # Expand query
-        expanded_queries = self.expand_query(query, intent)
+        expanded_queries = self.expand_query(query, intent, keywords=keywords)
 
         # Detect temporal context
-        temporal_context = self.detect_temporal_context(query)
+        temporal_context = self._temporal_context(query, query_lower)
 
         return {
             'original': query,
@@ -81,45 +127,29 @@ class QueryProcessor:
 
     def classify_intent(self, query: str) -> str:
         """Classify the intent of the query"""
-        query_lower = query.lower()
+        return self._classify_lowered(query.lower())
 
+    def _classify_lowered(self, query_lower: str) -> str:
+        """classify_intent on an already-lowercased query"""
         # Check each intent pattern
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower, re.IGNORECASE):
-                    return intent
+        for intent, regex in _INTENT_REGEXES:
+            if regex.search(query_lower):
+                return intent
 
         # Default to factual
         return 'factual'
 
     def extract_keywords(self, query: str) -> List[str]:
         """Extract important keywords from query"""
-        # Remove common stop words
-        stop_words = {
-            'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-            'should', 'may', 'might', 'can', 'of', 'at', 'by', 'for', 'with',
-            'about', 'as', 'into', 'through', 'during', 'before', 'after',
-            'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on',
-            'off', 'over', 'under', 'again', 'further', 'then', 'once'
-        }
-
-        # Extract words (preserve case for proper nouns)
-        words = re.findall(r'\b[A-Za-z][a-z]*[A-Za-z0-9]*\b', query)
-
-        # Filter stop words and short words
-        keywords = []
-        for word in words:
-            if word.lower() not in stop_words and len(word) > 2:
-                # Preserve if starts with capital (likely proper noun)
-                if word[0].isupper():
-                    keywords.append(word)
-                else:
-                    keywords.append(word.lower())
-
-        return keywords
-
-    def expand_query(self, query: str, intent: str) -> List[str]:
+        # Extract words, drop short words and stop words (length check first,
+        # it's cheaper), and preserve case if it starts with a capital (likely proper noun)
+        return [
+            word if word[0].isupper() else word.lower()
+            for word in _WORD_RE.findall(query)
+            if len(word) > 2 and word.lower() not in _KEYWORD_STOP_WORDS
+        ]
+
+    def expand_query(self, query: str, intent: str, keywords: Optional[List[str]] = None) -> List[str]:
         """
         Generate query variations for better search coverage
         """
@@ -128,7 +158,8 @@ class QueryProcessor:
         # Add original query
         expanded.append(query)
 
-        keywords = self.extract_keywords(query)
+        if keywords is None:
+            keywords = self.extract_keywords(query)
 
         # Intent-specific expansions
         if intent == 'how_to':
@@ -181,37 +212,27 @@ class QueryProcessor:
         """
         Detect time-related context in the query
         """
-        query_lower = query.lower()
-
-        temporal_markers = {
-            'recent': ['recent', 'latest', 'current', 'now', 'today', 'this week', 'this month'],
-            'historical': ['history', 'historical', 'origin', 'invented', 'founded', 'created'],
-            'future': ['future', 'upcoming', 'will', 'prediction', 'forecast'],
-            'specific_year': re.findall(r'\b(19\d{2}|20\d{2})\b', query)
-        }
+        return self._temporal_context(query, query.lower())
 
+    def _temporal_context(self, query: str, query_lower: str) -> Dict[str, any]:
+        """detect_temporal_context with the lowercased query supplied by the caller"""
         context = {
             'time_relevance': 'any',  # any, recent, historical, future
             'specific_year': None,
             'requires_fresh_data': False
         }
 
-        # Check for recent/current markers
-        if any(marker in query_lower for marker in temporal_markers['recent']):
-            context['time_relevance'] = 'recent'
-            context['requires_fresh_data'] = True
-
-        # Check for historical markers
-        elif any(marker in query_lower for marker in temporal_markers['historical']):
-            context['time_relevance'] = 'historical'
-
-        # Check for future markers
-        elif any(marker in query_lower for marker in temporal_markers['future']):
-            context['time_relevance'] = 'future'
+        # Check for recent/current, then historical, then future markers
+        for time_relevance, markers in TEMPORAL_MARKERS.items():
+            if any(marker in query_lower for marker in markers):
+                context['time_relevance'] = time_relevance
+                context['requires_fresh_data'] = time_relevance == 'recent'
+                break
 
         # Check for specific year
-        if temporal_markers['specific_year']:
-            context['specific_year'] = temporal_markers['specific_year'][0]
+        specific_years = _YEAR_RE.findall(query)
+        if specific_years:
+            context['specific_year'] = specific_years[0]
 
         return context
 
@@ -270,4 +291,13 @@ class QueryProcessor:
         elif intent == 'comparison':
             hints['expected_sources'] = 8
 
-        return hints
\ No newline at end of file
+        return hints
+
+
+_PROCESSOR = QueryProcessor()
+
+
+@lru_cache(maxsize=1024)
+def _process_query_cached(query: str, current_year: int) -> Dict[str, any]:
+    """Memoized query analysis (deterministic for a given query and year)"""
+    return _PROCESSOR._analyze_query(query)
@@ -3,9 +3,49 @@ RAG (Retrieval-Augmented Generation) Pipeline
 Implements multi-stage retrieval, ranking, and response generation
 """
 
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Iterable, List, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import heapq
 import re
-from difflib import SequenceMatcher
+
+
+# Compiled once at import for the per-query / per-source text passes
+_KEY_TERM_RE = re.compile(r'\b\w{4,}\b')
+_QUERY_TERM_RE = re.compile(r'\b\w{3,}\b')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Common words ignored when matching query terms against sources
+_KEY_TERM_STOP_WORDS = frozenset({
+    'what', 'when', 'where', 'who', 'why', 'how', 'is', 'are', 'was',
+    'were', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at',
+    'to', 'for', 'of', 'with', 'by', 'from', 'as', 'this', 'that',
+    'these', 'those', 'can', 'could', 'would', 'should', 'may', 'might',
+    'will', 'shall', 'do', 'does', 'did', 'have', 'has', 'had'
+})
+_QUERY_TERM_STOP_WORDS = frozenset({'what', 'when', 'where', 'who', 'why', 'how', 'the', 'a', 'an'})
+
+# Freshness by publish year (years are clamped to 2024 first; older years score 0.4)
+_FRESHNESS_BY_YEAR = {2024: 1.0, 2023: 0.8, 2022: 0.6}
+
+# Domain authority by registered domain (subdomains inherit the score)
+_DOMAIN_AUTHORITY = {
+    # High authority
+    'wikipedia.org': 1.0, 'github.com': 1.0, 'stackoverflow.com': 1.0,
+    'arxiv.org': 1.0, 'nature.com': 1.0, 'science.org': 1.0,
+    'nytimes.com': 1.0, 'bbc.com': 1.0, 'reuters.com': 1.0, 'theguardian.com': 1.0,
+    # Medium authority
+    'medium.com': 0.7, 'techcrunch.com': 0.7, 'wired.com': 0.7, 'forbes.com': 0.7,
+    'cnn.com': 0.7, 'bloomberg.com': 0.7
+}
+# Domain labels that mark an institution (also matched inside ccTLDs, e.g. gov.uk)
+_HIGH_AUTHORITY_LABELS = frozenset({'gov', 'edu'})
+_MEDIUM_AUTHORITY_LABELS = frozenset({'org'})
+
+
+def _count_term_hits(text: str, terms: Iterable[str]) -> int:
+    """Number of query terms (duplicates included) occurring as substrings of text"""
+    return sum(1 for term in terms if term in text)
 
 
 class SourceRanker:
@@ -23,44 +63,41 @@ class SourceRanker:
         self,
         sources: List[Dict],
         query: str,
-        max_results: int = 10
+        max_results: int = 10,
+        query_terms: Optional[List[str]] = None
     ) -> List[Dict]:
         """
         Rank sources by relevance to query
-        Returns top N sources sorted by score
+        Returns top N sources sorted by score (each source dict gets its
+        'relevance_score' set in place)
         """
         scored_sources = []
 
-        query_terms = self._extract_key_terms(query)
+        if query_terms is None:
+            query_terms = self._extract_key_terms(query)
 
         for source in sources:
-            score = self._calculate_relevance_score(source, query, query_terms)
-            scored_sources.append({
-                **source,
-                'relevance_score': score
-            })
+            if '_title_lc' not in source:
+                self._lowercase_fields(source)
+            source['relevance_score'] = self._calculate_relevance_score(source, query, query_terms)
+            scored_sources.append(source)
 
-        # Sort by relevance score descending
-        scored_sources.sort(key=lambda x: x['relevance_score'], reverse=True)
+        # Top N by relevance score descending (partial selection; ties keep input order)
+        return heapq.nlargest(max_results, scored_sources, key=lambda x: x['relevance_score'])
 
-        return scored_sources[:max_results]
+    def _lowercase_fields(self, source: Dict) -> None:
+        """Cache lowercased title/snippet/url on the source so rescoring doesn't re-lower them"""
+        source['_title_lc'] = source.get('title', '').lower()
+        source['_snippet_lc'] = source.get('snippet', '').lower()
+        source['_url_lc'] = source.get('url', '').lower()
 
     def _extract_key_terms(self, text: str) -> List[str]:
         """Extract meaningful terms from query"""
-        # Remove common words
-        stop_words = {
-            'what', 'when', 'where', 'who', 'why', 'how', 'is', 'are', 'was',
-            'were', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at',
-            'to', 'for', 'of', 'with', 'by', 'from', 'as', 'this', 'that',
-            'these', 'those', 'can', 'could', 'would', 'should', 'may', 'might',
-            'will', 'shall', 'do', 'does', 'did', 'have', 'has', 'had'
-        }
-
         # Extract words (4+ characters)
-        words = re.findall(r'\b\w{4,}\b', text.lower())
+        words = _KEY_TERM_RE.findall(text.lower())
 
         # Filter stop words
-        key_terms = [w for w in words if w not in stop_words]
+        key_terms = [w for w in words if w not in _KEY_TERM_STOP_WORDS]
 
         return key_terms
 
@@ -71,48 +108,33 @@ class SourceRanker:
         query_terms: List[str]
     ) -> float:
         """Calculate overall relevance score for a source"""
-        title = source.get('title', '').lower()
-        snippet = source.get('snippet', '').lower()
-        url = source.get('url', '').lower()
+        title = source['_title_lc']
+        snippet = source['_snippet_lc']
+        url = source['_url_lc']
+        num_terms = max(len(query_terms), 1)
 
         # 1. Title relevance
-        title_score = 0.0
-        for term in query_terms:
-            if term in title:
-                title_score += 1.0
-        title_score = min(title_score / max(len(query_terms), 1), 1.0)
+        title_score = min(_count_term_hits(title, query_terms) / num_terms, 1.0)
 
         # 2. Snippet relevance
-        snippet_score = 0.0
-        for term in query_terms:
-            if term in snippet:
-                snippet_score += 1.0
-        snippet_score = min(snippet_score / max(len(query_terms), 1), 1.0)
+        snippet_score = min(_count_term_hits(snippet, query_terms) / num_terms, 1.0)
 
         # Boost if query appears as exact phrase
         if query.lower() in snippet:
             snippet_score = min(snippet_score + 0.3, 1.0)
 
         # 3. Freshness score (if publishDate available)
-        freshness_score = 0.5  # Default neutral score
-        publish_date = source.get('publishDate')
-        if publish_date:
-            # Simple freshness: articles from 2024+ get higher scores
-            try:
-                year = int(publish_date[:4])
-                if year >= 2024:
-                    freshness_score = 1.0
-                elif year >= 2023:
-                    freshness_score = 0.8
-                elif year >= 2022:
-                    freshness_score = 0.6
-                else:
-                    freshness_score = 0.4
-            except:
-                pass
-
-        # 4. Domain authority (simple heuristic)
-        domain_score = self._calculate_domain_authority(url)
+        # Simple freshness: articles from 2024+ get higher scores
+        year = self._publish_year(source)
+        if year is None:
+            freshness_score = 0.5  # Default neutral score
+        else:
+            freshness_score = _FRESHNESS_BY_YEAR.get(min(year, 2024), 0.4)
+
+        # 4. Domain authority (simple heuristic; query-independent, so cached on the source)
+        domain_score = source.get('_domain_score')
+        if domain_score is None:
+            domain_score = source['_domain_score'] = self._calculate_domain_authority(url)
 
         # Weighted final score
         final_score = (
@@ -124,30 +146,42 @@ class SourceRanker:
 
         return final_score
 
+    def _publish_year(self, source: Dict) -> Optional[int]:
+        """Year from the source's publishDate (None if missing/unparseable), parsed once and cached as _year"""
+        if '_year' in source:
+            return source['_year']
+
+        year = None
+        publish_date = source.get('publishDate')
+        if publish_date:
+            try:
+                year = int(publish_date[:4])
+            except (TypeError, ValueError):
+                pass
+
+        source['_year'] = year
+        return year
+
     def _calculate_domain_authority(self, url: str) -> float:
         """Simple domain authority scoring"""
-        # High authority domains
-        high_authority = [
-            'wikipedia.org', 'github.com', 'stackoverflow.com',
-            '.gov', '.edu', 'arxiv.org', 'nature.com', 'science.org',
-            'nytimes.com', 'bbc.com', 'reuters.com', 'theguardian.com'
-        ]
-
-        # Medium authority
-        medium_authority = [
-            'medium.com', 'techcrunch.com', 'wired.com', 'forbes.com',
-            '.org', 'cnn.com', 'bloomberg.com'
-        ]
+        try:
+            host = urlsplit(url).hostname or ''
+        except ValueError:
+            return 0.5
 
-        url_lower = url.lower()
+        labels = host.split('.')
 
-        for domain in high_authority:
-            if domain in url_lower:
-                return 1.0
+        # Exact registered domain or any parent of the host (en.wikipedia.org -> wikipedia.org)
+        for i in range(len(labels) - 1):
+            score = _DOMAIN_AUTHORITY.get('.'.join(labels[i:]))
+            if score is not None:
+                return score
 
-        for domain in medium_authority:
-            if domain in url_lower:
-                return 0.7
+        suffix_labels = labels[1:]
+        if not _HIGH_AUTHORITY_LABELS.isdisjoint(suffix_labels):
+            return 1.0
+        if not _MEDIUM_AUTHORITY_LABELS.isdisjoint(suffix_labels):
+            return 0.7
 
         # Default score for other domains
         return 0.5
@@ -163,7 +197,8 @@ class SnippetExtractor:
         self,
         source: Dict,
         query: str,
-        num_snippets: int = 2
+        num_snippets: int = 2,
+        query_terms: Optional[List[str]] = None
     ) -> List[str]:
         """
         Extract most relevant snippets from source content
@@ -173,24 +208,32 @@ class SnippetExtractor:
         if not content:
             return []
 
-        # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', content)
+        # Split into sentences (no sentence punctuation means a single sentence, skip the regex)
+        if '.' in content or '!' in content or '?' in content:
+            sentences = _SENTENCE_SPLIT_RE.split(content)
+        else:
+            sentences = [content]
+
+        candidates = [sentence for sentence in sentences if len(sentence) > 20]  # Minimum sentence length
+
+        if query_terms is None:
+            query_terms = self._extract_query_terms(query)
+
+        if query_terms:
+            # Score each sentence, return top snippets by relevance
+            scored_sentences = [
+                (sentence, self._score_sentence_relevance(sentence, query_terms))
+                for sentence in candidates
+            ]
+            top_sentences = [
+                sentence for sentence, score in heapq.nlargest(num_snippets, scored_sentences, key=lambda x: x[1])
+            ]
+        else:
+            # No terms: every sentence scores 0, so the top ones are simply the first ones
+            top_sentences = candidates[:max(num_snippets, 0)]
 
-        # Score each sentence
-        query_terms = self._extract_query_terms(query)
-        scored_sentences = []
-
-        for sentence in sentences:
-            if len(sentence) > 20:  # Minimum sentence length
-                score = self._score_sentence_relevance(sentence, query_terms)
-                scored_sentences.append((sentence, score))
-
-        # Sort by relevance
-        scored_sentences.sort(key=lambda x: x[1], reverse=True)
-
-        # Return top snippets
         snippets = []
-        for sentence, score in scored_sentences[:num_snippets]:
+        for sentence in top_sentences:
             snippet = sentence[:self.max_snippet_length]
             if len(sentence) > self.max_snippet_length:
                 snippet += '...'
@@ -200,18 +243,12 @@ class SnippetExtractor:
 
     def _extract_query_terms(self, query: str) -> List[str]:
         """Extract key terms from query"""
-        words = re.findall(r'\b\w{3,}\b', query.lower())
-        stop_words = {'what', 'when', 'where', 'who', 'why', 'how', 'the', 'a', 'an'}
-        return [w for w in words if w not in stop_words]
+        words = _QUERY_TERM_RE.findall(query.lower())
+        return [w for w in words if w not in _QUERY_TERM_STOP_WORDS]
 
     def _score_sentence_relevance(self, sentence: str, query_terms: List[str]) -> float:
         """Score a sentence's relevance to query terms"""
-        sentence_lower = sentence.lower()
-        score = 0.0
-
-        for term in query_terms:
-            if term in sentence_lower:
-                score += 1.0
+        score = float(_count_term_hits(sentence.lower(), query_terms))
 
         # Normalize by sentence length (prefer concise matches)
         word_count = len(sentence.split())
@@ -221,6 +258,22 @@ class SnippetExtractor:
         return score
 
 
+_RANKER = SourceRanker()
+_SNIPPET_EXTRACTOR = SnippetExtractor()
+
+
+@lru_cache(maxsize=1024)
+def _query_artifacts(query: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    (ranker key terms, snippet terms) for a query
+    Memoized across requests (deterministic for a given query); tuples so cached terms can't be mutated
+    """
+    return (
+        tuple(_RANKER._extract_key_terms(query)),
+        tuple(_SNIPPET_EXTRACTOR._extract_query_terms(query))
+    )
+
+
 class RAGPipeline:
     """Complete RAG pipeline for search and response generation"""
 
@@ -235,34 +288,86 @@ class RAGPipeline:
         max_sources: int = 10
     ) -> Tuple[List[Dict], int]:
         """
-        Process and rank sources for RAG
+        Process and rank sources for RAG (source dicts are annotated in place)
         Returns: (ranked_sources, total_sources_reviewed)
         """
         total_reviewed = len(sources)
 
+        # Lowercase each source's fields once up front
+        for source in sources:
+            self.ranker._lowercase_fields(source)
+
+        # Query terms are computed once per query rather than per call / per source
+        key_terms, snippet_terms = _query_artifacts(query)
+
         # Rank sources by relevance
-        ranked_sources = self.ranker.rank_sources(sources, query, max_sources)
+        ranked_sources = self.ranker.rank_sources(sources, query, max_sources, query_terms=key_terms)
 
         # Enhance with extracted snippets
-        enhanced_sources = []
-        for source in ranked_sources:
-            # Extract additional relevant snippets if available
-            snippets = self.snippet_extractor.extract_relevant_snippets(source, query)
+        self._enhance_sources(ranked_sources, query, snippet_terms)
 
-            # Combine original snippet with extracted snippets
-            all_snippets = [source.get('snippet', '')]
-            all_snippets.extend(snippets)
+        return ranked_sources, total_reviewed
 
-            # Use best snippet (usually the original is already good from search API)
-            enhanced_source = {
-                **source,
-                'enhanced_snippets': snippets,
-                'best_snippet': all_snippets[0] if all_snippets else ''
-            }
+    def ingest(
+        self,
+        sources: Iterable[Dict],
+        query: str,
+        max_sources: int = 10,
+        min_score: float = 0.2
+    ) -> Tuple[List[Dict], int]:
+        """
+        Deduplicate, rank, filter and enhance sources in a single pass
+        (same result as deduplicate_sources -> process_sources -> filter_low_quality_sources)
+        Returns: (top sources scoring at least min_score, unique sources reviewed)
+        """
+        key_terms, snippet_terms = _query_artifacts(query)
 
-            enhanced_sources.append(enhanced_source)
+        seen_urls = set()
+        # Min-heap of (score, -arrival, source) holding the best max_sources so far;
+        # -arrival keeps earlier sources ahead on ties and dicts out of comparisons
+        heap = []
 
-        return enhanced_sources, total_reviewed
+        for source in sources:
+            key = self._canonical_url(source.get('url', ''))
+            if key in seen_urls:
+                continue
+            seen_urls.add(key)
+
+            self.ranker._lowercase_fields(source)
+            score = self.ranker._calculate_relevance_score(source, query, key_terms)
+            source['relevance_score'] = score
+
+            entry = (score, -len(seen_urls), source)
+            if len(heap) < max_sources:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+
+        # Snippet extraction only runs on the survivors
+        top_sources = [
+            source for score, _, source in sorted(heap, reverse=True)
+            if score >= min_score
+        ]
+        self._enhance_sources(top_sources, query, snippet_terms)
+
+        return top_sources, len(seen_urls)
+
+    def _enhance_sources(
+        self,
+        sources: List[Dict],
+        query: str,
+        snippet_terms: List[str]
+    ) -> None:
+        """Attach extracted snippets to each source in place"""
+        for source in sources:
+            # Extract additional relevant snippets if available
+            snippets = self.snippet_extractor.extract_relevant_snippets(
+                source, query, query_terms=snippet_terms
+            )
+
+            # Use best snippet (usually the original is already good from search API)
+            source['enhanced_snippets'] = snippets
+            source['best_snippet'] = source.get('snippet', '')
 
     def deduplicate_sources(self, sources: List[Dict]) -> List[Dict]:
         """Remove duplicate sources based on URL and content similarity"""
@@ -270,17 +375,28 @@ class RAGPipeline:
         unique_sources = []
 
         for source in sources:
-            url = source.get('url', '')
-
-            # Normalize URL (remove trailing slashes, www, etc.)
-            normalized_url = url.lower().rstrip('/').replace('www.', '')
-
-            if normalized_url not in seen_urls:
-                seen_urls.add(normalized_url)
-                unique_sources.append(source)
+            key = self._canonical_url(source.get('url', ''))
+            if key in seen_urls:
+                continue
+            seen_urls.add(key)
+            unique_sources.append(source)
 
         return unique_sources
 
+    def _canonical_url(self, url: str) -> Tuple[str, str, str]:
+        """Dedup key for a URL: (host without leading www., path without trailing slash, query)"""
+        url = url.lower()
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname or ''
+        except ValueError:
+            # Unparseable URL: fall back to the trimmed string itself
+            return ('', url.rstrip('/'), '')
+
+        if host.startswith('www.'):
+            host = host[4:]
+        return (host, parts.path.rstrip('/'), parts.query)
+
     def filter_low_quality_sources(
         self,
         sources: List[Dict],
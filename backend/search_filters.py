@@ -7,6 +7,8 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from enum import Enum
 
+from logger import logger
+
 
 class DateFilter(str, Enum):
     """Predefined date filter options"""
@@ -29,17 +31,33 @@ class FileType(str, Enum):
     TXT = "txt"
 
 
+# Date filters the Custom Search API accepts as dateRestrict
+_VALID_DATE_FILTERS = frozenset({
+    DateFilter.PAST_DAY.value,
+    DateFilter.PAST_WEEK.value,
+    DateFilter.PAST_MONTH.value,
+    DateFilter.PAST_YEAR.value,
+})
+
+
+def _publish_datetime(source: Dict) -> Optional[datetime]:
+    """Source's publishDate as a datetime (None if missing/unparseable)"""
+    publish_date = source.get('publishDate')
+    if not publish_date:
+        return None
+
+    # Parse ISO date or other formats
+    if isinstance(publish_date, str):
+        try:
+            return datetime.fromisoformat(publish_date.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return publish_date
+
+
 class SearchFilterManager:
     """Manages search filters for Google Custom Search API"""
 
-    def __init__(self):
-        self.supported_date_filters = {
-            DateFilter.PAST_DAY: "d1",
-            DateFilter.PAST_WEEK: "w1",
-            DateFilter.PAST_MONTH: "m1",
-            DateFilter.PAST_YEAR: "y1",
-        }
-
     def build_filter_params(
         self,
         date_filter: Optional[str] = None,
@@ -64,54 +82,46 @@ class SearchFilterManager:
             Dictionary of API parameters
         """
         params = {}
+        # Query fragments, joined into params['q_append'] once at the end
+        q_parts = []
 
         # Date restriction
         if date_filter and date_filter != DateFilter.ANY_TIME:
-            if date_filter in self.supported_date_filters.values():
+            if date_filter in _VALID_DATE_FILTERS:
                 params['dateRestrict'] = date_filter
-                print(f"🗓️  Date filter: {date_filter}")
+                logger.debug("🗓️  Date filter: %s", date_filter)
 
         # Domain inclusion (site search)
         if include_domains:
             # Google CSE supports OR for multiple domains
             # Format: site:domain1.com OR site:domain2.com
-            domain_query = " OR ".join([f"site:{d}" for d in include_domains])
-            params['q_append'] = domain_query
-            print(f"🌐 Include domains: {', '.join(include_domains)}")
+            q_parts.append(" OR ".join([f"site:{d}" for d in include_domains]))
+            logger.debug("🌐 Include domains: %s", include_domains)
 
         # Domain exclusion
         if exclude_domains:
             # Format: -site:domain1.com -site:domain2.com
-            exclude_query = " ".join([f"-site:{d}" for d in exclude_domains])
-            if 'q_append' in params:
-                params['q_append'] += f" {exclude_query}"
-            else:
-                params['q_append'] = exclude_query
-            print(f"🚫 Exclude domains: {', '.join(exclude_domains)}")
+            q_parts.append(" ".join([f"-site:{d}" for d in exclude_domains]))
+            logger.debug("🚫 Exclude domains: %s", exclude_domains)
 
         # File type filter
         if file_type:
             params['fileType'] = file_type
-            print(f"📄 File type: {file_type}")
+            logger.debug("📄 File type: %s", file_type)
 
         # Exact terms filter
         if exact_terms:
             # Add quotes around exact phrase
-            exact_query = f'"{exact_terms}"'
-            if 'q_append' in params:
-                params['q_append'] += f" {exact_query}"
-            else:
-                params['q_append'] = exact_query
-            print(f"💬 Exact terms: {exact_terms}")
+            q_parts.append(f'"{exact_terms}"')
+            logger.debug("💬 Exact terms: %s", exact_terms)
 
         # Exclude terms
         if exclude_terms:
-            exclude_query = " ".join([f"-{term}" for term in exclude_terms.split()])
-            if 'q_append' in params:
-                params['q_append'] += f" {exclude_query}"
-            else:
-                params['q_append'] = exclude_query
-            print(f" Exclude terms: {exclude_terms}")
+            q_parts.append(" ".join([f"-{term}" for term in exclude_terms.split()]))
+            logger.debug(" Exclude terms: %s", exclude_terms)
+
+        if q_parts:
+            params['q_append'] = " ".join(q_parts)
 
         return params
 
@@ -188,6 +198,12 @@ class SearchFilterManager:
         Returns:
             Filtered list of sources
         """
+        # Nothing to filter on
+        if not include_domains and not exclude_domains and not min_date and not max_date:
+            return list(sources)
+
+        include_domains = [domain.lower() for domain in include_domains or []]
+        exclude_domains = [domain.lower() for domain in exclude_domains or []]
         filtered = []
 
         for source in sources:
@@ -195,31 +211,24 @@ class SearchFilterManager:
 
             # Domain inclusion filter
             if include_domains:
-                if not any(domain.lower() in url for domain in include_domains):
+                if not any(domain in url for domain in include_domains):
                     continue
 
             # Domain exclusion filter
             if exclude_domains:
-                if any(domain.lower() in url for domain in exclude_domains):
+                if any(domain in url for domain in exclude_domains):
                     continue
 
-            # Date range filter
+            # Date range filter (if the date can't be parsed or compared, include the source)
             if min_date or max_date:
-                publish_date = source.get('publishDate')
-                if publish_date:
+                pub_dt = _publish_datetime(source)
+                if pub_dt is not None:
                     try:
-                        # Parse ISO date or other formats
-                        if isinstance(publish_date, str):
-                            pub_dt = datetime.fromisoformat(publish_date.replace('Z', '+00:00'))
-                        else:
-                            pub_dt = publish_date
-
                         if min_date and pub_dt < min_date:
                             continue
                         if max_date and pub_dt > max_date:
                             continue
-                    except (ValueError, TypeError):
-                        # If date parsing fails, include the source
+                    except TypeError:
                         pass
 
             filtered.append(source)